@@ -9,4 +9,7 @@ class DiscountsConfig(AppConfig):
     verbose_name = _('Discounts')
 
     def ready(self):
-        pass
+        from . import signals  # noqa: F401
+        from .services.discount_service import get_discount_service
+
+        get_discount_service().preload_models()
@@ -0,0 +1,44 @@
+"""
+Cache helpers for the Discounts module.
+
+Cached values are namespaced per hub and tied to a version counter, so a
+write only has to bump the version to invalidate every dependent key.
+"""
+import time
+
+from django.core.cache import cache
+
+# Cross-hub "could any promotion be live right now" hint used by DiscountService.
+LIVE_PROMOTIONS_KEY = 'discounts:promotions:any_live'
+LIVE_PROMOTIONS_TTL = 30
+
+
+def _version_key(namespace, hub_id):
+    return f'discounts:{namespace}:{hub_id}:version'
+
+
+def get_version(namespace, hub_id):
+    """Return the current cache version for ``namespace`` on ``hub_id``."""
+    return cache.get_or_set(_version_key(namespace, hub_id), time.time_ns, None)
+
+
+def bump_version(namespace, hub_id):
+    """Invalidate every key built with ``versioned_key`` for this namespace/hub."""
+    key = _version_key(namespace, hub_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Version evicted: start from a fresh value so old keys never match again.
+        cache.set(key, time.time_ns(), None)
+
+
+def versioned_key(namespace, hub_id, *parts):
+    """Build a cache key that changes whenever ``bump_version`` is called."""
+    version = get_version(namespace, hub_id)
+    return ':'.join(['discounts', namespace, str(hub_id), f'v{version}', *map(str, parts)])
+
+
+def multi_versioned_key(namespaces, hub_id, *parts):
+    """``versioned_key`` for values derived from several namespaces; any bump invalidates it."""
+    versions = [f'v{get_version(namespace, hub_id)}' for namespace in namespaces]
+    return ':'.join(['discounts', '+'.join(namespaces), str(hub_id), *versions, *map(str, parts)])
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-14 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(fields=['hub_id', 'is_active', 'valid_from', 'valid_until'], name='disc_coupon_active_win'),
+        ),
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(fields=['hub_id', 'is_active', 'valid_from', 'valid_until'], name='disc_promo_active_win'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-14 09:30
+
+from django.db import migrations, models
+
+
+def days_of_week_to_mask(days_of_week):
+    mask = 0
+    for day in days_of_week.split(','):
+        day = day.strip()
+        if day.isdigit() and int(day) < 7:
+            mask |= 1 << int(day)
+    return mask
+
+
+def populate_days_of_week_mask(apps, schema_editor):
+    Promotion = apps.get_model('discounts', 'Promotion')
+    for promotion in Promotion.objects.exclude(days_of_week='').only('id', 'days_of_week').iterator():
+        Promotion.objects.filter(pk=promotion.pk).update(
+            days_of_week_mask=days_of_week_to_mask(promotion.days_of_week),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0002_coupon_disc_coupon_active_win_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promotion',
+            name='days_of_week_mask',
+            field=models.PositiveSmallIntegerField(default=127, editable=False, help_text='Weekday bitmask derived from days_of_week (bit 0=Mon)'),
+        ),
+        migrations.RunPython(populate_days_of_week_mask, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-14 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0003_promotion_days_of_week_mask'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['valid_until'], name='disc_coupon_expiry'),
+        ),
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['valid_until'], name='disc_promo_expiry'),
+        ),
+    ]
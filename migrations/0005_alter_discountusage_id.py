@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-14 10:30
+
+import discounts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0004_coupon_disc_coupon_expiry_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='discountusage',
+            name='id',
+            field=models.UUIDField(default=discounts.models.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
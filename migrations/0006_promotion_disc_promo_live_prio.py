@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-14 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0005_alter_discountusage_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['hub_id', 'valid_from', 'valid_until', '-priority'], name='disc_promo_live_prio'),
+        ),
+    ]
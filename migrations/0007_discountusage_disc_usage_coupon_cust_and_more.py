@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-14 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0006_promotion_disc_promo_live_prio'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='discountusage',
+            index=models.Index(fields=['coupon', 'customer'], name='disc_usage_coupon_cust'),
+        ),
+        migrations.AddIndex(
+            model_name='discountusage',
+            index=models.Index(fields=['promotion', 'customer'], name='disc_usage_promo_cust'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-14 12:30
+
+from django.db import migrations
+from django.db.models.functions import Trim, Upper
+
+
+def uppercase_coupon_codes(apps, schema_editor):
+    Coupon = apps.get_model('discounts', 'Coupon')
+    Coupon.objects.update(code=Upper(Trim('code')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0007_discountusage_disc_usage_coupon_cust_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(uppercase_coupon_codes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-14 13:00
+
+from django.db import migrations
+
+# Datatable search uses icontains, which PostgreSQL compiles to
+# ``UPPER(col::text) LIKE UPPER(%s)``; trigram indexes on that exact
+# expression let the planner answer '%term%' without a sequential scan.
+TRIGRAM_INDEXES = (
+    ('disc_coupon_name_trgm', 'discounts_coupon', 'name'),
+    ('disc_coupon_code_trgm', 'discounts_coupon', 'code'),
+    ('disc_promo_name_trgm', 'discounts_promotion', 'name'),
+    ('disc_promo_desc_trgm', 'discounts_promotion', 'description'),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} '
+            f'USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _table, _column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0008_normalize_coupon_codes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
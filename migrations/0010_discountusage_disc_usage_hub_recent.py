@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-14 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0009_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='discountusage',
+            index=models.Index(
+                condition=models.Q(('is_deleted', False)),
+                fields=['hub_id', '-used_at'], name='disc_usage_hub_recent',
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-14 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0010_discountusage_disc_usage_hub_recent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(
+                condition=models.Q(('is_deleted', False)),
+                fields=['hub_id', 'name', 'id'], name='disc_promo_hub_name',
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-14 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0011_promotion_disc_promo_hub_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(
+                condition=models.Q(('is_deleted', False)),
+                fields=['hub_id', '-created_at'], name='disc_coupon_hub_live',
+            ),
+        ),
+    ]
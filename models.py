@@ -1,12 +1,80 @@
-from decimal import Decimal
-
-from django.db import models
+import os
+import time
+import uuid
+from collections import Counter
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import models, transaction
+from django.db.models import BooleanField, Case, Count, ExpressionWrapper, F, Q, Value, When
+from django.db.models.functions import Least, Round
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 from apps.core.models.base import HubBaseModel
 
+from .caching import bump_version
+
+
+# Zero money amount shared with the service and views, at the fields' 2 places
+ZERO = Decimal('0.00')
+_HUNDRED = Decimal('100')
+ALL_DAYS_MASK = 0b1111111
+
+
+def _to_cents(amount):
+    return int((Decimal(amount) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def _discount_amount(discount_type, discount_value, max_discount, order_total):
+    """
+    Discount math shared by coupons and promotions, done in integer cents.
+
+    Decimals are converted once on the way in and once on the way out;
+    a 2-decimal percentage is already basis points in cents form. The
+    result is rounded half-up to whole cents.
+    """
+    if discount_type == 'percentage':
+        cents = (_to_cents(order_total) * _to_cents(discount_value) + 5000) // 10000
+        if max_discount:
+            cents = min(cents, _to_cents(max_discount))
+        return Decimal(cents).scaleb(-2)
+    if discount_type == 'fixed':
+        cents = min(_to_cents(discount_value), _to_cents(order_total))
+        return Decimal(cents).scaleb(-2)
+    return ZERO
+
+
+def uuid7():
+    """
+    Time-ordered UUID (RFC 9562 version 7).
+
+    Consecutive values share a millisecond-timestamp prefix, so inserts land
+    at the right-hand edge of the primary key B-tree instead of at random.
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), 'big')
+    value = (
+        (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76
+        | (rand >> 62 & 0xFFF) << 64
+        | 0b10 << 62
+        | rand & (1 << 62) - 1
+    )
+    return uuid.UUID(int=value)
+
+
+def days_of_week_to_mask(days_of_week):
+    """Convert a '0,2,4' day list (0=Mon) into a weekday bitmask; blank = all days."""
+    if not days_of_week:
+        return ALL_DAYS_MASK
+    mask = 0
+    for day in days_of_week.split(','):
+        day = day.strip()
+        if day.isdigit() and int(day) < 7:
+            mask |= 1 << int(day)
+    return mask
+
 
 # ============================================================================
 # Coupon (code-based discounts)
@@ -72,14 +140,34 @@ class Coupon(HubBaseModel):
         indexes = [
             models.Index(fields=['hub_id', 'code']),
             models.Index(fields=['hub_id', 'is_active']),
+            models.Index(
+                fields=['hub_id', 'is_active', 'valid_from', 'valid_until'],
+                name='disc_coupon_active_win',
+            ),
+            models.Index(
+                fields=['valid_until'], name='disc_coupon_expiry',
+                condition=Q(is_active=True),
+            ),
+            # Live coupons per hub in the datatable's default newest-first order
+            models.Index(
+                fields=['hub_id', '-created_at'], name='disc_coupon_hub_live',
+                condition=Q(is_deleted=False),
+            ),
         ]
 
     def __str__(self):
         return f"{self.code} - {self.name}"
 
+    def save(self, *args, **kwargs):
+        # Codes are stored uppercase so lookups are plain equality matches.
+        self.code = self.code.strip().upper()
+        super().save(*args, **kwargs)
+
     @property
     def status(self):
-        now = timezone.now()
+        return self.status_at(timezone.now())
+
+    def status_at(self, now):
         if not self.is_active:
             return 'inactive'
         if self.usage_limit and self.usage_count >= self.usage_limit:
@@ -94,44 +182,231 @@ class Coupon(HubBaseModel):
     def is_valid(self):
         return self.status == 'active'
 
+    def is_valid_at(self, now):
+        return self.status_at(now) == 'active'
+
+    @classmethod
+    def with_status(cls, queryset, now=None):
+        """Annotate ``computed_status`` on ``queryset``, mirroring ``status`` in SQL."""
+        now = now or timezone.now()
+        return queryset.annotate(computed_status=Case(
+            When(is_active=False, then=Value('inactive')),
+            When(usage_limit__gt=0, usage_count__gte=F('usage_limit'), then=Value('exhausted')),
+            When(valid_from__gt=now, then=Value('scheduled')),
+            When(valid_until__lt=now, then=Value('expired')),
+            default=Value('active'),
+            output_field=models.CharField(),
+        ))
+
+    @classmethod
+    def with_customer_uses(cls, queryset, customer):
+        """
+        Annotate ``customer_uses`` with ``customer``'s usage count per coupon.
+
+        ``can_use`` reads the annotation instead of issuing its own COUNT, so
+        only pass the resulting coupons to ``can_use`` for that same customer.
+        """
+        return queryset.annotate(customer_uses=Count(
+            'usages', filter=Q(usages__customer=customer, usages__is_deleted=False),
+        ))
+
+    def applies_to(self, product_ids=(), category_ids=()):
+        """
+        Whether the coupon's scope matches a cart with these product/category ids.
+
+        A single EXISTS query against the scope rows; order-wide coupons
+        never query.
+        """
+        if self.scope == 'order':
+            return True
+        if self.scope == 'products':
+            cart_ids, related, field = product_ids, self.product_scope, 'product_id'
+        elif self.scope == 'categories':
+            cart_ids, related, field = category_ids, self.category_scope, 'category_id'
+        else:
+            return False
+        cart_ids = frozenset(map(str, cart_ids or ()))
+        if not cart_ids:
+            return False
+        return related.filter(**{f'{field}__in': cart_ids}).exists()
+
+    @classmethod
+    def bulk_import(cls, hub_id, records, batch_size=500):
+        """
+        Create many coupons for ``hub_id`` with batched INSERTs.
+
+        ``records`` is an iterable of field dicts. Codes are normalized the
+        same way as the coupon form. ``save()`` and model signals are
+        skipped, so callers must pass already-validated data.
+        """
+        coupons = []
+        for record in records:
+            coupon = cls(hub_id=hub_id, **record)
+            coupon.code = coupon.code.strip().upper()
+            coupons.append(coupon)
+        created = cls.objects.bulk_create(coupons, batch_size=batch_size)
+        bump_version('coupons', hub_id)
+        return created
+
+    @classmethod
+    def batch_scan(cls, queryset=None, chunk_size=500):
+        """
+        Iterate ``queryset`` (default: all coupons) in chunks of ``chunk_size``.
+
+        Use this for exports and background jobs that walk every row: it
+        streams through the database cursor instead of caching the whole
+        result set on the queryset.
+        """
+        if queryset is None:
+            queryset = cls.objects.all()
+        return queryset.iterator(chunk_size=chunk_size)
+
     @property
     def remaining_uses(self):
         if self.usage_limit is None:
             return None
         return max(0, self.usage_limit - self.usage_count)
 
-    def can_use(self, customer=None, order_total=Decimal('0')):
-        if not self.is_valid:
-            return False, f"Coupon is {self.status}"
+    def can_use(self, customer=None, order_total=ZERO, now=None):
+        customer_uses = None
+        if customer and self.usage_per_customer:
+            customer_uses = getattr(self, 'customer_uses', None)
+            if customer_uses is None:
+                customer_uses = DiscountUsage.objects.filter(
+                    coupon=self, customer=customer, is_deleted=False,
+                ).count()
+        return self._check_use(order_total, customer_uses, now or timezone.now())
+
+    @classmethod
+    def bulk_can_use(cls, coupons, customer=None, order_total=ZERO, now=None):
+        """
+        Evaluate ``can_use`` for already-loaded coupons.
+
+        Per-customer usage is counted with one GROUP BY query over all the
+        coupons. Returns a dict of ``{coupon.id: (can_use, reason)}``.
+        """
+        now = now or timezone.now()
+        customer_uses = {}
+        if customer:
+            customer_uses = dict(
+                DiscountUsage.objects.filter(
+                    coupon_id__in=[c.id for c in coupons],
+                    customer=customer, is_deleted=False,
+                ).order_by().values_list('coupon_id').annotate(Count('id'))
+            )
+        return {
+            coupon.id: coupon._check_use(
+                order_total,
+                customer_uses.get(coupon.id, 0) if customer and coupon.usage_per_customer else None,
+                now,
+            )
+            for coupon in coupons
+        }
+
+    def _check_use(self, order_total, customer_uses, now):
+        status = self.status_at(now)
+        if status != 'active':
+            return False, f"Coupon is {status}"
 
         if self.min_purchase and order_total < self.min_purchase:
             return False, f"Minimum purchase of {self.min_purchase} required"
 
-        if customer and self.usage_per_customer:
-            customer_uses = DiscountUsage.objects.filter(
-                coupon=self, customer=customer, is_deleted=False,
-            ).count()
-            if customer_uses >= self.usage_per_customer:
-                return False, "Usage limit per customer reached"
+        if customer_uses is not None and customer_uses >= self.usage_per_customer:
+            return False, "Usage limit per customer reached"
 
         return True, "Coupon is valid"
 
     def calculate_discount(self, order_total):
+        if not order_total or not self.discount_value:
+            return ZERO
         if order_total < self.min_purchase:
-            return Decimal('0.00')
+            return ZERO
 
-        if self.discount_type == 'percentage':
-            discount = order_total * (self.discount_value / 100)
-            if self.max_discount:
-                discount = min(discount, self.max_discount)
-            return discount
-        elif self.discount_type == 'fixed':
-            return min(self.discount_value, order_total)
-        return Decimal('0.00')
+        return _discount_amount(
+            self.discount_type, self.discount_value, self.max_discount, order_total,
+        )
 
     def increment_usage(self):
-        self.usage_count += 1
-        self.save(update_fields=['usage_count', 'updated_at'])
+        """
+        Atomically bump ``usage_count`` in the database.
+
+        The in-memory value is left untouched; call ``refresh_from_db()``
+        if the new count is needed. ``update()`` sends no signals, so the
+        coupon cache version is bumped here.
+        """
+        type(self).objects.filter(pk=self.pk).update(
+            usage_count=F('usage_count') + 1,
+            updated_at=timezone.now(),
+        )
+        bump_version('coupons', self.hub_id)
+
+    def record_usage(self, customer_id=None, sale_id=None,
+                     amount_discounted=ZERO, original_amount=ZERO):
+        """Increment the usage counter and log a DiscountUsage in one transaction."""
+        with transaction.atomic():
+            self.increment_usage()
+            return DiscountUsage.objects.create(
+                hub_id=self.hub_id,
+                coupon=self,
+                customer_id=customer_id,
+                sale_id=sale_id,
+                amount_discounted=amount_discounted,
+                original_amount=original_amount,
+            )
+
+    @classmethod
+    def bulk_record_usage(cls, entries, batch_size=500):
+        """
+        Batched ``record_usage`` for ``(coupon, customer_id, sale_id,
+        amount_discounted, original_amount)`` entries.
+
+        The coupons are locked and their counters re-read first, so entries
+        beyond a coupon's ``usage_limit`` are dropped. The rest cost one
+        UPDATE (per-coupon increments via ``Case``) and batched INSERTs for
+        the DiscountUsage rows, all in one transaction. Returns the created
+        rows.
+        """
+        entries = list(entries)
+        if not entries:
+            return []
+        with transaction.atomic():
+            remaining = {
+                pk: limit - count if limit else None
+                for pk, limit, count in cls.objects.select_for_update().filter(
+                    pk__in={entry[0].pk for entry in entries},
+                ).values_list('pk', 'usage_limit', 'usage_count')
+            }
+            accepted = []
+            for entry in entries:
+                left = remaining.get(entry[0].pk, 0)
+                if left is None or left > 0:
+                    accepted.append(entry)
+                    if left is not None:
+                        remaining[entry[0].pk] = left - 1
+            if not accepted:
+                return []
+            increments = Counter(entry[0].pk for entry in accepted)
+            cls.objects.filter(pk__in=increments).update(
+                usage_count=F('usage_count') + Case(
+                    *[When(pk=pk, then=Value(n)) for pk, n in increments.items()],
+                    default=Value(0),
+                ),
+                updated_at=timezone.now(),
+            )
+            created = DiscountUsage.objects.bulk_create([
+                DiscountUsage(
+                    hub_id=coupon.hub_id,
+                    coupon=coupon,
+                    customer_id=customer_id,
+                    sale_id=sale_id,
+                    amount_discounted=amount_discounted,
+                    original_amount=original_amount,
+                )
+                for coupon, customer_id, sale_id, amount_discounted, original_amount in accepted
+            ], batch_size=batch_size)
+        for hub_id in {entry[0].hub_id for entry in accepted}:
+            bump_version('coupons', hub_id)
+        return created
 
 
 # ============================================================================
@@ -176,6 +451,10 @@ class Promotion(HubBaseModel):
         max_length=20, blank=True,
         help_text=_('Comma-separated days (0=Mon, 6=Sun). Empty = all days'),
     )
+    days_of_week_mask = models.PositiveSmallIntegerField(
+        default=ALL_DAYS_MASK, editable=False,
+        help_text=_('Weekday bitmask derived from days_of_week (bit 0=Mon)'),
+    )
     start_time = models.TimeField(null=True, blank=True)
     end_time = models.TimeField(null=True, blank=True)
 
@@ -199,14 +478,40 @@ class Promotion(HubBaseModel):
         indexes = [
             models.Index(fields=['hub_id', 'is_active']),
             models.Index(fields=['valid_from', 'valid_until']),
+            models.Index(
+                fields=['hub_id', 'is_active', 'valid_from', 'valid_until'],
+                name='disc_promo_active_win',
+            ),
+            models.Index(
+                fields=['valid_until'], name='disc_promo_expiry',
+                condition=Q(is_active=True),
+            ),
+            models.Index(
+                fields=['hub_id', 'valid_from', 'valid_until', '-priority'],
+                name='disc_promo_live_prio', condition=Q(is_active=True),
+            ),
+            # Keyset paging of the datatable's default (name, pk) order
+            models.Index(
+                fields=['hub_id', 'name', 'id'], name='disc_promo_hub_name',
+                condition=Q(is_deleted=False),
+            ),
         ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.days_of_week_mask = days_of_week_to_mask(self.days_of_week)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'days_of_week' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'days_of_week_mask'}
+        super().save(*args, **kwargs)
+
     @property
     def status(self):
-        now = timezone.now()
+        return self.status_at(timezone.now())
+
+    def status_at(self, now):
         if not self.is_active:
             return 'inactive'
         if self.valid_from > now:
@@ -215,16 +520,67 @@ class Promotion(HubBaseModel):
             return 'expired'
         return 'active'
 
+    @classmethod
+    def with_status(cls, queryset, now=None):
+        """Annotate ``computed_status`` on ``queryset``, mirroring ``status`` in SQL."""
+        now = now or timezone.now()
+        return queryset.annotate(computed_status=Case(
+            When(is_active=False, then=Value('inactive')),
+            When(valid_from__gt=now, then=Value('scheduled')),
+            When(valid_until__lt=now, then=Value('expired')),
+            default=Value('active'),
+            output_field=models.CharField(),
+        ))
+
+    @classmethod
+    def with_validity(cls, queryset, now=None):
+        """Annotate ``computed_is_valid`` on ``queryset``, mirroring ``is_valid`` in SQL."""
+        now = now or timezone.now()
+        current_time = now.time()
+        return queryset.alias(
+            day_bit=F('days_of_week_mask').bitand(1 << now.weekday()),
+        ).annotate(computed_is_valid=ExpressionWrapper(
+            Q(is_active=True, valid_from__lte=now, valid_until__gte=now, day_bit__gt=0)
+            & (Q(start_time__isnull=True) | Q(start_time__lte=current_time))
+            & (Q(end_time__isnull=True) | Q(end_time__gte=current_time)),
+            output_field=BooleanField(),
+        ))
+
+    @classmethod
+    def with_discount_amount(cls, queryset, order_total):
+        """
+        Annotate ``computed_discount``, mirroring ``calculate_discount(order_total)`` in SQL.
+
+        Lets the database rank candidates by the discount they would give
+        without instantiating Decimals per row in Python.
+        """
+        amount_field = models.DecimalField(max_digits=12, decimal_places=2)
+        total = Value(order_total, output_field=amount_field)
+        percentage = Round(total * F('discount_value') / _HUNDRED, 2, output_field=amount_field)
+        return queryset.annotate(computed_discount=Case(
+            When(min_purchase__gt=order_total, then=Value(ZERO)),
+            When(
+                discount_type='percentage',
+                then=Case(
+                    When(max_discount__gt=0, then=Least(percentage, F('max_discount'))),
+                    default=percentage,
+                ),
+            ),
+            When(discount_type='fixed', then=Least(F('discount_value'), total)),
+            default=Value(ZERO),
+            output_field=amount_field,
+        ))
+
     @property
     def is_valid(self):
-        if self.status != 'active':
+        return self.is_valid_at(timezone.now())
+
+    def is_valid_at(self, now):
+        if not self.is_active or self.valid_from > now or self.valid_until < now:
             return False
 
-        now = timezone.now()
-        if self.days_of_week:
-            current_day = str(now.weekday())
-            if current_day not in self.days_of_week.split(','):
-                return False
+        if not self.days_of_week_mask & (1 << now.weekday()):
+            return False
 
         current_time = now.time()
         if self.start_time and current_time < self.start_time:
@@ -235,17 +591,14 @@ class Promotion(HubBaseModel):
         return True
 
     def calculate_discount(self, order_total):
+        if not order_total or not self.discount_value:
+            return ZERO
         if self.min_purchase and order_total < self.min_purchase:
-            return Decimal('0.00')
+            return ZERO
 
-        if self.discount_type == 'percentage':
-            discount = order_total * (self.discount_value / 100)
-            if self.max_discount:
-                discount = min(discount, self.max_discount)
-            return discount
-        elif self.discount_type == 'fixed':
-            return min(self.discount_value, order_total)
-        return Decimal('0.00')
+        return _discount_amount(
+            self.discount_type, self.discount_value, self.max_discount, order_total,
+        )
 
 
 # ============================================================================
@@ -335,6 +688,8 @@ class DiscountCondition(HubBaseModel):
 # ============================================================================
 
 class DiscountUsage(HubBaseModel):
+    # Time-ordered keys: usages are append-only and the highest-volume table.
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     coupon = models.ForeignKey(
         Coupon, on_delete=models.CASCADE, related_name='usages',
         null=True, blank=True,
@@ -365,14 +720,34 @@ class DiscountUsage(HubBaseModel):
         ordering = ['-used_at']
         indexes = [
             models.Index(fields=['used_at']),
+            # Per-customer limit checks in Coupon.can_use / bulk_can_use
+            models.Index(fields=['coupon', 'customer'], name='disc_usage_coupon_cust'),
+            models.Index(fields=['promotion', 'customer'], name='disc_usage_promo_cust'),
+            # Usage report: newest live usages per hub, read in index order
+            models.Index(
+                fields=['hub_id', '-used_at'], name='disc_usage_hub_recent',
+                condition=Q(is_deleted=False),
+            ),
         ]
 
     def __str__(self):
         parent = self.coupon or self.promotion
         return f"{parent} - {self.amount_discounted}"
 
+    @classmethod
+    def for_listing(cls, queryset=None):
+        """
+        Join the relations shown when listing usages (``__str__``, reports).
+
+        Use this for any queryset rendered row by row, to avoid one query per
+        usage for its coupon, promotion, sale and customer.
+        """
+        if queryset is None:
+            queryset = cls.objects.all()
+        return queryset.select_related('coupon', 'promotion', 'sale', 'customer')
+
     @property
     def savings_percentage(self):
         if self.original_amount and self.original_amount > 0:
-            return (self.amount_discounted / self.original_amount) * 100
-        return Decimal('0.00')
+            return (self.amount_discounted / self.original_amount) * _HUNDRED
+        return ZERO
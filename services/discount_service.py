@@ -5,13 +5,20 @@ Provides business logic for applying coupons and promotions to orders.
 """
 
 from dataclasses import dataclass
+from datetime import datetime
 from decimal import Decimal
+from operator import attrgetter
 from typing import Optional
 
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Prefetch, Q
 from django.utils import timezone
 
+from discounts.caching import LIVE_PROMOTIONS_KEY, LIVE_PROMOTIONS_TTL
+from discounts.models import ZERO
 
-@dataclass
+
+@dataclass(slots=True)
 class AppliedDiscount:
     """Represents a discount applied to an order."""
     source: str  # 'coupon' or 'promotion'
@@ -23,7 +30,7 @@ class AppliedDiscount:
     original_total: Decimal
 
 
-@dataclass
+@dataclass(slots=True)
 class DiscountResult:
     """Result of applying discounts to an order."""
     original_total: Decimal
@@ -33,16 +40,20 @@ class DiscountResult:
     errors: list[str]
 
 
-# Singleton instance
-_discount_service: Optional['DiscountService'] = None
+# Columns read while pricing an order; description and schedule fields stay deferred.
+PROMOTION_PRICING_FIELDS = (
+    'id', 'hub_id', 'name', 'discount_type', 'discount_value', 'scope',
+    'min_purchase', 'max_discount', 'buy_quantity', 'get_quantity',
+    'get_discount_percent', 'priority', 'stackable',
+)
 
 
-def get_discount_service() -> 'DiscountService':
-    """Get or create the singleton DiscountService instance."""
-    global _discount_service
-    if _discount_service is None:
-        _discount_service = DiscountService()
-    return _discount_service
+# Columns read by Coupon.can_use / calculate_discount and the applied-discount record.
+COUPON_PRICING_FIELDS = (
+    'id', 'hub_id', 'code', 'name', 'discount_type', 'discount_value',
+    'min_purchase', 'max_discount', 'usage_limit', 'usage_per_customer',
+    'usage_count', 'valid_from', 'valid_until', 'is_active',
+)
 
 
 class DiscountService:
@@ -60,6 +71,12 @@ class DiscountService:
         self._coupon_model = None
         self._promotion_model = None
 
+    def preload_models(self) -> None:
+        """Resolve model classes up front; called from ``AppConfig.ready()``."""
+        from discounts.models import Coupon, Promotion
+        self._coupon_model = Coupon
+        self._promotion_model = Promotion
+
     @property
     def Coupon(self):
         """Lazy-load Coupon model."""
@@ -79,8 +96,10 @@ class DiscountService:
     def validate_coupon(
         self,
         code: str,
-        order_total: Decimal = Decimal('0'),
-        customer_id: str | None = None
+        order_total: Decimal = ZERO,
+        customer_id: str | None = None,
+        now: datetime | None = None,
+        hub_id=None
     ) -> tuple[bool, str, Optional['Coupon']]:
         """
         Validate a coupon code.
@@ -89,16 +108,28 @@ class DiscountService:
             code: Coupon code to validate
             order_total: Current order total
             customer_id: Optional customer identifier
+            now: Evaluation instant (defaults to the current time)
+            hub_id: Hub to look the code up in (codes are only unique per
+                hub, and soft-deleted coupons may reuse a live code)
 
         Returns:
             Tuple of (is_valid, message, coupon_or_none)
         """
+        coupons = self.Coupon.objects.filter(is_deleted=False).only(*COUPON_PRICING_FIELDS)
+        if hub_id is not None:
+            coupons = coupons.filter(hub_id=hub_id)
+        if customer_id:
+            # Fetch the per-customer usage count in the same round-trip.
+            coupons = self.Coupon.with_customer_uses(coupons, customer_id)
         try:
-            coupon = self.Coupon.objects.get(code__iexact=code.strip())
+            coupon = coupons.get(code=code.strip().upper())
         except self.Coupon.DoesNotExist:
             return False, "Invalid coupon code", None
+        except self.Coupon.MultipleObjectsReturned:
+            # Without a hub the code can match live coupons on several hubs.
+            return False, "Coupon code is ambiguous", None
 
-        can_use, reason = coupon.can_use(customer_id, order_total)
+        can_use, reason = coupon.can_use(customer_id, order_total, now)
         if not can_use:
             return False, reason, None
 
@@ -108,7 +139,9 @@ class DiscountService:
         self,
         code: str,
         order_total: Decimal,
-        customer_id: str | None = None
+        customer_id: str | None = None,
+        now: datetime | None = None,
+        hub_id=None
     ) -> tuple[Decimal, str, Optional['Coupon']]:
         """
         Apply a coupon to an order.
@@ -117,34 +150,81 @@ class DiscountService:
             code: Coupon code
             order_total: Order total before discount
             customer_id: Optional customer identifier
+            now: Evaluation instant (defaults to the current time)
+            hub_id: Hub to look the code up in
 
         Returns:
             Tuple of (discount_amount, message, coupon_or_none)
         """
-        is_valid, message, coupon = self.validate_coupon(code, order_total, customer_id)
+        is_valid, message, coupon = self.validate_coupon(
+            code, order_total, customer_id, now, hub_id
+        )
 
         if not is_valid:
-            return Decimal('0'), message, None
+            return ZERO, message, None
 
         discount_amount = coupon.calculate_discount(order_total)
         return discount_amount, f"Coupon applied: -{discount_amount}", coupon
 
+    def get_active_promotions_queryset(self, now: datetime | None = None):
+        """
+        Build the (unevaluated) queryset of promotions valid at ``now``.
+
+        The validity window, weekday and time-of-day schedule are all evaluated
+        in SQL (see ``Promotion.with_validity``), so only usable rows are loaded.
+        """
+        return self.Promotion.with_validity(
+            self.Promotion.objects.filter(is_deleted=False), now or timezone.now()
+        ).filter(computed_is_valid=True).only(
+            *PROMOTION_PRICING_FIELDS
+        ).order_by('-priority')
+
     def get_active_promotions(self) -> list:
-        """Get all currently active promotions."""
-        now = timezone.now()
+        """Get all promotions valid right now, with their scope rows prefetched."""
+        from discounts.models import PromotionCategory, PromotionProduct
+
         return list(
-            self.Promotion.objects.filter(
+            self.get_active_promotions_queryset().prefetch_related(
+                Prefetch(
+                    'product_scope',
+                    queryset=PromotionProduct.objects.only('promotion_id', 'product_id'),
+                ),
+                Prefetch(
+                    'category_scope',
+                    queryset=PromotionCategory.objects.only('promotion_id', 'category_id'),
+                ),
+            )
+        )
+
+    def has_live_promotions(self) -> bool:
+        """
+        Return whether any active promotion, on any hub, is inside its
+        validity window.
+
+        This is a cross-hub hint: ``False`` means no promotion can apply
+        anywhere, so checkouts skip the promotion queries entirely, while
+        ``True`` only means the full lookup must run. The weekday/time
+        schedule is left to that lookup. The answer is cached for
+        ``LIVE_PROMOTIONS_TTL`` seconds and dropped on every promotion write.
+        """
+        live = cache.get(LIVE_PROMOTIONS_KEY)
+        if live is None:
+            now = timezone.now()
+            live = self.Promotion.objects.filter(
                 is_active=True,
+                is_deleted=False,
                 valid_from__lte=now,
                 valid_until__gte=now
-            ).order_by('-priority')
-        )
+            ).exists()
+            cache.set(LIVE_PROMOTIONS_KEY, live, LIVE_PROMOTIONS_TTL)
+        return live
 
     def get_applicable_promotions(
         self,
         order_total: Decimal,
         product_ids: list[str] | None = None,
-        category_ids: list[str] | None = None
+        category_ids: list[str] | None = None,
+        now: datetime | None = None
     ) -> list:
         """
         Get promotions applicable to the current order.
@@ -153,42 +233,33 @@ class DiscountService:
             order_total: Current order total
             product_ids: List of product IDs in the order
             category_ids: List of category IDs of products in order
+            now: Evaluation instant (defaults to the current time)
 
         Returns:
             List of applicable Promotion objects
         """
-        from discounts.models import DiscountScope
-
-        active_promotions = self.get_active_promotions()
-        applicable = []
-
-        for promo in active_promotions:
-            if not promo.is_valid:
-                continue
-
-            if promo.minimum_purchase and order_total < promo.minimum_purchase:
-                continue
-
-            # Check scope
-            if promo.scope == DiscountScope.ENTIRE_ORDER:
-                applicable.append(promo)
-            elif promo.scope == DiscountScope.SPECIFIC_PRODUCTS and product_ids:
-                promo_product_ids = set(
-                    promo.products.values_list('product_id', flat=True)
-                )
-                if promo_product_ids.intersection(set(product_ids)):
-                    applicable.append(promo)
-            elif promo.scope == DiscountScope.SPECIFIC_CATEGORIES and category_ids:
-                promo_category_ids = set(
-                    promo.categories.values_list('category_id', flat=True)
-                )
-                if promo_category_ids.intersection(set(category_ids)):
-                    applicable.append(promo)
-            elif promo.scope == DiscountScope.MINIMUM_PURCHASE:
-                if not promo.minimum_purchase or order_total >= promo.minimum_purchase:
-                    applicable.append(promo)
-
-        return applicable
+        from discounts.models import PromotionCategory, PromotionProduct
+
+        product_ids = frozenset(product_ids or ())
+        category_ids = frozenset(category_ids or ())
+
+        # Scope and minimum purchase are matched in the same query; EXISTS keeps
+        # one row per promotion without needing DISTINCT.
+        scope_q = Q(scope='order')
+        if product_ids:
+            scope_q |= Q(scope='products') & Exists(PromotionProduct.objects.filter(
+                promotion=OuterRef('pk'), product_id__in=product_ids,
+            ))
+        if category_ids:
+            scope_q |= Q(scope='categories') & Exists(PromotionCategory.objects.filter(
+                promotion=OuterRef('pk'), category_id__in=category_ids,
+            ))
+
+        queryset = self.get_active_promotions_queryset(now).filter(
+            scope_q,
+            Q(min_purchase__isnull=True) | Q(min_purchase__lte=order_total),
+        )
+        return list(self.Promotion.with_discount_amount(queryset, order_total))
 
     def calculate_order_discounts(
         self,
@@ -197,7 +268,8 @@ class DiscountService:
         customer_id: str | None = None,
         product_ids: list[str] | None = None,
         category_ids: list[str] | None = None,
-        allow_stacking: bool = False
+        allow_stacking: bool = False,
+        hub_id=None
     ) -> DiscountResult:
         """
         Calculate all applicable discounts for an order.
@@ -209,21 +281,22 @@ class DiscountService:
             product_ids: List of product IDs in order
             category_ids: List of category IDs in order
             allow_stacking: Allow multiple discounts to stack
+            hub_id: Hub the coupon code belongs to
 
         Returns:
             DiscountResult with all applied discounts
         """
-        from discounts.models import DiscountType
-
         applied_discounts: list[AppliedDiscount] = []
         errors: list[str] = []
         working_total = order_total
-        total_discount = Decimal('0')
+        total_discount = ZERO
+        # One clock reading shared by coupon and promotion validity checks
+        now = timezone.now()
 
         # Apply coupon first (if provided)
         if coupon_code:
             discount_amount, message, coupon = self.apply_coupon(
-                coupon_code, order_total, customer_id
+                coupon_code, order_total, customer_id, now, hub_id
             )
             if coupon and discount_amount > 0:
                 applied_discounts.append(AppliedDiscount(
@@ -242,7 +315,7 @@ class DiscountService:
                 if not allow_stacking:
                     return DiscountResult(
                         original_total=order_total,
-                        discounted_total=max(Decimal('0'), working_total),
+                        discounted_total=max(ZERO, working_total),
                         total_discount=total_discount,
                         applied_discounts=applied_discounts,
                         errors=errors
@@ -251,40 +324,69 @@ class DiscountService:
                 errors.append(message)
 
         # Apply promotions
-        promotions = self.get_applicable_promotions(
-            working_total, product_ids, category_ids
-        )
-
-        for promo in promotions:
-            if not allow_stacking and applied_discounts and not promo.stackable:
-                continue
+        promotions = []
+        if self.has_live_promotions():
+            promotions = self.get_applicable_promotions(
+                working_total, product_ids, category_ids, now
+            )
 
-            discount_amount = promo.calculate_discount(working_total)
-            if discount_amount > 0:
-                applied_discounts.append(AppliedDiscount(
-                    source='promotion',
-                    source_id=str(promo.id),
-                    source_name=promo.name,
-                    discount_type=promo.discount_type,
-                    discount_value=promo.discount_value,
-                    discount_amount=discount_amount,
-                    original_total=working_total
-                ))
-                total_discount += discount_amount
-                working_total -= discount_amount
+        # Non-stackable promotions are mutually exclusive: keep the largest one
+        # (ranked by the SQL ``computed_discount``). With stacking allowed the
+        # stackable ones are layered on top in priority order; without it the
+        # non-stackable one is never combined, and the stackable ones apply
+        # instead only when together they save more.
+        best = max(
+            (promo for promo in promotions if not promo.stackable),
+            key=attrgetter('computed_discount'), default=None,
+        )
+        exclusive = [best] if best is not None and best.computed_discount > 0 else []
+        stackable = [promo for promo in promotions if promo.stackable]
+        if allow_stacking:
+            steps = self._layer_promotions(exclusive + stackable, working_total)
+        else:
+            steps = max(
+                self._layer_promotions(exclusive, working_total),
+                self._layer_promotions(stackable, working_total),
+                key=lambda layered: sum(amount for _, amount, _ in layered),
+            )
 
-                # Stop after first non-stackable promotion
-                if not promo.stackable:
-                    break
+        for promo, discount_amount, base_total in steps:
+            applied_discounts.append(AppliedDiscount(
+                source='promotion',
+                source_id=str(promo.id),
+                source_name=promo.name,
+                discount_type=promo.discount_type,
+                discount_value=promo.discount_value,
+                discount_amount=discount_amount,
+                original_total=base_total
+            ))
+            total_discount += discount_amount
+            working_total -= discount_amount
 
         return DiscountResult(
             original_total=order_total,
-            discounted_total=max(Decimal('0'), working_total),
+            discounted_total=max(ZERO, working_total),
             total_discount=total_discount,
             applied_discounts=applied_discounts,
             errors=errors
         )
 
+    @staticmethod
+    def _layer_promotions(promotions, total):
+        """
+        Apply ``promotions`` in turn, each on what the previous ones left.
+
+        Returns ``(promotion, discount_amount, total_before)`` for every
+        promotion that actually discounts something.
+        """
+        steps = []
+        for promo in promotions:
+            discount_amount = promo.calculate_discount(total)
+            if discount_amount > 0:
+                steps.append((promo, discount_amount, total))
+                total -= discount_amount
+        return steps
+
     def record_coupon_usage(
         self,
         coupon_code: str,
@@ -300,8 +402,51 @@ class DiscountService:
             True if usage was recorded, False if coupon not found
         """
         try:
-            coupon = self.Coupon.objects.get(code__iexact=coupon_code.strip())
+            coupon = self.Coupon.objects.get(code=coupon_code.strip().upper())
             coupon.record_usage(customer_id, sale_id)
             return True
         except self.Coupon.DoesNotExist:
             return False
+
+    def record_coupon_usages(
+        self,
+        hub_id,
+        usages: list[tuple[str, str | None, str | None, Decimal, Decimal]]
+    ) -> int:
+        """
+        Record several coupon uses at once, e.g. for a multi-coupon checkout.
+
+        Args:
+            hub_id: Hub the codes belong to (codes are only unique per hub)
+            usages: ``(coupon_code, customer_id, sale_id, amount_discounted,
+                original_amount)`` tuples
+
+        Returns:
+            Number of usages recorded; unknown codes and uses beyond a
+            coupon's usage limit are skipped
+        """
+        normalized = [
+            (code.strip().upper(), *rest) for code, *rest in usages
+        ]
+        coupons = {
+            coupon.code: coupon
+            for coupon in self.Coupon.objects.filter(
+                hub_id=hub_id, is_deleted=False,
+                code__in={code for code, *_ in normalized},
+            )
+        }
+        entries = [
+            (coupons[code], *rest)
+            for code, *rest in normalized
+            if code in coupons
+        ]
+        return len(self.Coupon.bulk_record_usage(entries))
+
+
+# Singleton instance; construction is cheap because models resolve lazily.
+_discount_service = DiscountService()
+
+
+def get_discount_service() -> DiscountService:
+    """Get the singleton DiscountService instance."""
+    return _discount_service
@@ -0,0 +1,27 @@
+"""
+Discounts module signal handlers.
+
+Every coupon or promotion write bumps the hub's cache version for that
+namespace, invalidating cached counts and serialized lists built with
+``caching.versioned_key``. Promotion writes also drop the live-promotions
+flag checked at checkout.
+"""
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import LIVE_PROMOTIONS_KEY, bump_version
+from .models import Coupon, Promotion
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def invalidate_coupon_caches(sender, instance, **kwargs):
+    bump_version('coupons', instance.hub_id)
+
+
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+def invalidate_promotion_caches(sender, instance, **kwargs):
+    bump_version('promotions', instance.hub_id)
+    cache.delete(LIVE_PROMOTIONS_KEY)
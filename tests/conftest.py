@@ -52,31 +52,45 @@ def client():
     return Client()
 
 
-@pytest.fixture
-def local_user(db):
+# The user and store config are never mutated by tests, so they are created
+# once per session (committed outside the per-test transactions) instead of
+# being rebuilt for every test that logs in. Being committed, they are deleted
+# again when the session ends so a reused database starts clean.
+
+@pytest.fixture(scope='session')
+def local_user(django_db_setup, django_db_blocker):
     """Create a test local user."""
     from django.contrib.auth.hashers import make_password
-    return LocalUser.objects.create(
-        name='Test User',
-        email='test@example.com',
-        role='admin',
-        pin_hash=make_password('1234'),
-        is_active=True
-    )
-
-
-@pytest.fixture
-def store_config(db):
+    with django_db_blocker.unblock():
+        user, _ = LocalUser.objects.get_or_create(
+            email='test@example.com',
+            defaults={
+                'name': 'Test User',
+                'role': 'admin',
+                'pin_hash': make_password('1234'),
+                'is_active': True,
+            },
+        )
+    yield user
+    with django_db_blocker.unblock():
+        user.delete()
+
+
+@pytest.fixture(scope='session')
+def store_config(django_db_setup, django_db_blocker):
     """Create store configuration (marks hub as configured)."""
-    config = StoreConfig.get_config()
-    config.is_configured = True
-    config.name = 'Test Store'
-    config.save()
-    return config
+    with django_db_blocker.unblock():
+        config = StoreConfig.get_config()
+        config.is_configured = True
+        config.name = 'Test Store'
+        config.save()
+    yield config
+    with django_db_blocker.unblock():
+        config.delete()
 
 
 @pytest.fixture
-def auth_client(client, local_user, store_config):
+def auth_client(db, client, local_user, store_config):
     """Create authenticated test client with session."""
     session = client.session
     session['local_user_id'] = str(local_user.id)
@@ -34,6 +34,13 @@ class TestCouponModel:
         """Test coupon string representation."""
         assert str(coupon) == 'TEST10 - Test 10% Off'
 
+    def test_coupon_code_normalized_on_save(self, coupon):
+        """Test codes are stored stripped and uppercase."""
+        coupon.code = ' summer25 '
+        coupon.save()
+        coupon.refresh_from_db()
+        assert coupon.code == 'SUMMER25'
+
     def test_coupon_is_valid_active(self, coupon):
         """Test is_valid returns True for active valid coupon."""
         assert coupon.is_valid is True
@@ -125,6 +132,40 @@ class TestCouponCanUse:
         assert "already used" in reason
 
 
+class TestCouponBulkCanUse:
+    """Tests for Coupon.bulk_can_use() method."""
+
+    def test_bulk_can_use_matches_can_use(self, coupon, expired_coupon, inactive_coupon):
+        """Test bulk results match per-coupon can_use results."""
+        coupons = [coupon, expired_coupon, inactive_coupon]
+        results = Coupon.bulk_can_use(coupons)
+        for c in coupons:
+            assert results[c.id] == c.can_use()
+
+    def test_bulk_can_use_without_customer_skips_queries(self, coupon, fixed_coupon, django_assert_num_queries):
+        """Test bulk_can_use needs no query when no customer limit applies."""
+        with django_assert_num_queries(0):
+            Coupon.bulk_can_use([coupon, fixed_coupon])
+
+
+class TestCouponAppliesTo:
+    """Tests for Coupon.applies_to() method."""
+
+    def test_order_scope_applies_without_queries(self, coupon, django_assert_num_queries):
+        """Test order-wide coupons match any cart without touching scope rows."""
+        with django_assert_num_queries(0):
+            assert coupon.applies_to(['prod-123']) is True
+
+    def test_product_scope_matches_with_one_query(self, coupon, django_assert_num_queries):
+        """Test product scope is matched with a single EXISTS per check."""
+        coupon.scope = 'products'
+        coupon.save()
+        CouponProduct.objects.create(coupon=coupon, product_id='prod-123')
+        with django_assert_num_queries(2):
+            assert coupon.applies_to(['prod-123']) is True
+            assert coupon.applies_to(['prod-999']) is False
+
+
 class TestCouponCalculateDiscount:
     """Tests for Coupon.calculate_discount() method."""
 
@@ -133,6 +174,12 @@ class TestCouponCalculateDiscount:
         discount = coupon.calculate_discount(Decimal('100.00'))
         assert discount == Decimal('10.00')
 
+    def test_calculate_percentage_rounds_to_cents(self, coupon):
+        """Test percentage discounts are rounded half-up to whole cents."""
+        discount = coupon.calculate_discount(Decimal('33.35'))
+        assert discount == Decimal('3.34')
+        assert discount.as_tuple().exponent == -2
+
     def test_calculate_fixed_discount(self, fixed_coupon):
         """Test fixed amount discount calculation."""
         discount = fixed_coupon.calculate_discount(Decimal('100.00'))
@@ -143,6 +190,11 @@ class TestCouponCalculateDiscount:
         discount = fixed_coupon.calculate_discount(Decimal('3.00'))
         assert discount == Decimal('3.00')
 
+    def test_calculate_discount_accepts_int_total(self, coupon, fixed_coupon):
+        """Test plain int totals are coerced to Decimal."""
+        assert coupon.calculate_discount(100) == Decimal('10.00')
+        assert fixed_coupon.calculate_discount(3) == Decimal('3.00')
+
     def test_calculate_percentage_with_max(self, db):
         """Test percentage discount with maximum cap."""
         coupon = Coupon.objects.create(
@@ -176,6 +228,64 @@ class TestCouponRecordUsage:
         assert usage.customer_id == 'cust-123'
         assert usage.sale_id == 'sale-456'
 
+    def test_bulk_record_usage_increments_each_coupon(self, coupon, fixed_coupon):
+        """Test bulk_record_usage applies per-coupon increments in one pass."""
+        created = Coupon.bulk_record_usage([
+            (coupon, None, None, Decimal('1.00'), Decimal('10.00')),
+            (coupon, None, None, Decimal('2.00'), Decimal('20.00')),
+            (fixed_coupon, None, None, Decimal('5.00'), Decimal('50.00')),
+        ])
+        assert len(created) == 3
+        assert [u.amount_discounted for u in created] == [
+            Decimal('1.00'), Decimal('2.00'), Decimal('5.00'),
+        ]
+        assert created[2].original_amount == Decimal('50.00')
+        coupon.refresh_from_db()
+        fixed_coupon.refresh_from_db()
+        assert coupon.usage_count == 2
+        assert fixed_coupon.usage_count == 1
+
+    def test_bulk_record_usage_stops_at_usage_limit(self, coupon):
+        """Test entries beyond the usage limit are dropped, not counted."""
+        coupon.usage_limit = 2
+        coupon.usage_count = 1
+        coupon.save()
+        created = Coupon.bulk_record_usage([
+            (coupon, None, None, Decimal('1.00'), Decimal('10.00')),
+            (coupon, None, None, Decimal('1.00'), Decimal('10.00')),
+        ])
+        assert len(created) == 1
+        coupon.refresh_from_db()
+        assert coupon.usage_count == 2
+
+
+class TestCouponBulkImport:
+    """Tests for Coupon.bulk_import() method."""
+
+    def test_bulk_import_creates_coupons(self, db):
+        """Test bulk_import inserts every record with normalized codes."""
+        created = Coupon.bulk_import(None, [
+            {'code': ' bulk1 ', 'name': 'Bulk 1', 'discount_value': Decimal('5.00')},
+            {'code': 'bulk2', 'name': 'Bulk 2', 'discount_value': Decimal('10.00')},
+        ])
+        assert len(created) == 2
+        assert set(Coupon.objects.values_list('code', flat=True)) == {'BULK1', 'BULK2'}
+
+
+class TestCouponWithStatus:
+    """Tests for Coupon.with_status() annotation."""
+
+    def test_with_status_matches_status_property(self, coupon, expired_coupon, inactive_coupon):
+        """Test computed_status agrees with the Python status property."""
+        rows = Coupon.with_status(Coupon.objects.all())
+        for row in rows:
+            assert row.computed_status == row.status
+
+    def test_with_status_filters_active(self, coupon, expired_coupon):
+        """Test filtering on computed_status returns only active coupons."""
+        active = Coupon.with_status(Coupon.objects.all()).filter(computed_status='active')
+        assert list(active) == [coupon]
+
 
 # ==============================================================================
 # COUPON RELATED MODELS TESTS
@@ -291,6 +401,20 @@ class TestPromotionModel:
         )
         assert promo.is_valid is False
 
+    def test_promotion_days_of_week_mask_on_save(self, promotion):
+        """Test days_of_week is encoded as a weekday bitmask on save."""
+        assert promotion.days_of_week_mask == 0b1111111
+        promotion.days_of_week = '0,2,6'
+        promotion.save()
+        promotion.refresh_from_db()
+        assert promotion.days_of_week_mask == 0b1000101
+
+    def test_promotion_is_valid_at(self, promotion):
+        """Test is_valid_at evaluates validity against the given instant."""
+        assert promotion.is_valid_at(promotion.valid_from) is True
+        assert promotion.is_valid_at(promotion.valid_until + timedelta(seconds=1)) is False
+        assert promotion.status_at(promotion.valid_from - timedelta(seconds=1)) == 'scheduled'
+
 
 class TestPromotionCalculateDiscount:
     """Tests for Promotion.calculate_discount() method."""
@@ -300,6 +424,13 @@ class TestPromotionCalculateDiscount:
         discount = promotion.calculate_discount(Decimal('100.00'))
         assert discount == Decimal('20.00')
 
+    def test_with_discount_amount_matches_calculate_discount(self, promotion):
+        """Test the SQL discount annotation agrees with calculate_discount."""
+        annotated = Promotion.with_discount_amount(
+            Promotion.objects.filter(pk=promotion.pk), Decimal('33.35')
+        ).get()
+        assert annotated.computed_discount == promotion.calculate_discount(Decimal('33.35'))
+
     def test_calculate_discount_below_minimum(self, db):
         """Test discount is zero below minimum purchase."""
         promo = Promotion.objects.create(
@@ -2,13 +2,17 @@
 Unit tests for Discount Service.
 """
 
+import uuid
+
 import pytest
 from decimal import Decimal
 from datetime import timedelta
 
+from django.core.cache import cache
 from django.utils import timezone
 
-from discounts.models import Coupon, Promotion, DiscountType, DiscountScope
+from discounts.caching import LIVE_PROMOTIONS_KEY
+from discounts.models import Coupon, DiscountUsage, Promotion, DiscountType, DiscountScope
 from discounts.services.discount_service import (
     DiscountService,
     AppliedDiscount,
@@ -122,6 +126,13 @@ class TestDiscountServiceInit:
         assert service._coupon_model is None
         assert service._promotion_model is None
 
+    def test_preload_models_resolves_classes(self):
+        """Test preload_models binds the model classes eagerly."""
+        service = DiscountService()
+        service.preload_models()
+        assert service._coupon_model is Coupon
+        assert service._promotion_model is Promotion
+
 
 # ==============================================================================
 # COUPON VALIDATION TESTS
@@ -166,6 +177,46 @@ class TestCouponValidation:
         is_valid, _, _ = service.validate_coupon('test10')
         assert is_valid is True
 
+    def test_validate_coupon_with_customer_single_query(self, coupon, django_assert_num_queries):
+        """Test per-customer usage is fetched together with the coupon."""
+        coupon.usage_per_customer = 1
+        coupon.save()
+        service = DiscountService()
+        with django_assert_num_queries(1):
+            is_valid, _, _ = service.validate_coupon('TEST10', customer_id=uuid.uuid4())
+        assert is_valid is True
+
+    def test_validate_coupon_skips_deleted_row_sharing_code(self, coupon):
+        """Test a soft-deleted coupon with the same code neither collides nor validates."""
+        deleted = Coupon.objects.create(
+            hub_id=coupon.hub_id,
+            code='TEST10',
+            name='Old 10% Off',
+            discount_type=DiscountType.PERCENTAGE,
+            discount_value=Decimal('10.00'),
+            is_active=True,
+            is_deleted=True,
+            valid_from=timezone.now() - timedelta(days=1),
+            valid_until=timezone.now() + timedelta(days=30),
+        )
+        service = DiscountService()
+        is_valid, _, result_coupon = service.validate_coupon('TEST10', hub_id=coupon.hub_id)
+        assert is_valid is True
+        assert result_coupon == coupon
+
+        Coupon.objects.filter(pk=coupon.pk).update(is_deleted=True)
+        is_valid, message, result_coupon = service.validate_coupon('TEST10', hub_id=deleted.hub_id)
+        assert is_valid is False
+        assert result_coupon is None
+        assert 'Invalid' in message
+
+    def test_validate_coupon_scoped_to_hub(self, coupon):
+        """Test a code is only found on the hub it belongs to."""
+        service = DiscountService()
+        is_valid, _, result_coupon = service.validate_coupon('TEST10', hub_id=uuid.uuid4())
+        assert is_valid is False
+        assert result_coupon is None
+
 
 # ==============================================================================
 # APPLY COUPON TESTS
@@ -242,6 +293,20 @@ class TestActivePromotions:
         for p in promotions:
             assert p.valid_until >= now
 
+    def test_get_active_promotions_excludes_other_weekdays(self, db):
+        """Test the weekday schedule is applied by the query."""
+        promo = Promotion.objects.create(
+            name='Wrong Day Sale',
+            discount_type=DiscountType.PERCENTAGE,
+            discount_value=Decimal('10.00'),
+            is_active=True,
+            valid_from=timezone.now() - timedelta(days=1),
+            valid_until=timezone.now() + timedelta(days=30),
+            days_of_week=str((timezone.now().weekday() + 1) % 7),
+        )
+        service = DiscountService()
+        assert promo not in service.get_active_promotions()
+
 
 # ==============================================================================
 # APPLICABLE PROMOTIONS TESTS
@@ -257,6 +322,14 @@ class TestApplicablePromotions:
         applicable = service.get_applicable_promotions(Decimal('100.00'))
         assert promotion in applicable
 
+    def test_get_applicable_promotions_skips_soft_deleted(self, promotion, stackable_promotion):
+        """Test a soft-deleted promotion is not applied while others are live."""
+        Promotion.objects.filter(pk=promotion.pk).update(is_deleted=True)
+        service = DiscountService()
+        applicable = service.get_applicable_promotions(Decimal('100.00'))
+        assert promotion not in applicable
+        assert stackable_promotion in applicable
+
     def test_get_applicable_promotions_respects_minimum(self, db):
         """Test minimum purchase is respected."""
         promo = Promotion.objects.create(
@@ -279,6 +352,15 @@ class TestApplicablePromotions:
         applicable = service.get_applicable_promotions(Decimal('75.00'))
         assert promo in applicable
 
+    def test_get_applicable_promotions_single_query(
+        self, promotion, stackable_promotion, django_assert_num_queries
+    ):
+        """Test scope matching happens in SQL rather than per promotion."""
+        service = DiscountService()
+        with django_assert_num_queries(1):
+            applicable = service.get_applicable_promotions(Decimal('100.00'))
+        assert promotion in applicable
+
 
 # ==============================================================================
 # CALCULATE ORDER DISCOUNTS TESTS
@@ -320,6 +402,63 @@ class TestCalculateOrderDiscounts:
         # Should apply the 20% promotion
         assert result.total_discount >= Decimal('20.00')
 
+    def test_calculate_skips_promotions_when_none_live(self, db, django_assert_num_queries):
+        """Test checkout skips promotion queries once no live promotions are cached."""
+        cache.delete(LIVE_PROMOTIONS_KEY)
+        service = DiscountService()
+        service.calculate_order_discounts(order_total=Decimal('100.00'))
+        with django_assert_num_queries(0):
+            result = service.calculate_order_discounts(order_total=Decimal('100.00'))
+        assert result.applied_discounts == []
+
+    def test_live_promotions_hint_ignores_soft_deleted(self, promotion):
+        """Test a soft-deleted promotion does not keep the live hint on."""
+        Promotion.objects.filter(pk=promotion.pk).update(is_deleted=True)
+        cache.delete(LIVE_PROMOTIONS_KEY)
+        assert DiscountService().has_live_promotions() is False
+
+    def test_calculate_picks_largest_non_stackable_promotion(self, promotion):
+        """Test the biggest non-stackable promotion wins regardless of priority."""
+        bigger = Promotion.objects.create(
+            name='Clearance',
+            discount_type=DiscountType.PERCENTAGE,
+            discount_value=Decimal('30.00'),
+            is_active=True,
+            valid_from=timezone.now() - timedelta(days=1),
+            valid_until=timezone.now() + timedelta(days=30),
+            priority=0,
+            stackable=False,
+        )
+        service = DiscountService()
+        result = service.calculate_order_discounts(order_total=Decimal('100.00'))
+        assert [d.source_id for d in result.applied_discounts] == [str(bigger.id)]
+        assert result.total_discount == Decimal('30.00')
+
+    @pytest.mark.parametrize('allow_stacking, expected_names, expected_discount', [
+        (False, ['Summer Sale'], Decimal('20.00')),
+        (True, ['Summer Sale', 'Extra 5% Off'], Decimal('24.00')),
+    ])
+    def test_calculate_honors_allow_stacking_for_promotions(
+        self, promotion, stackable_promotion, allow_stacking, expected_names, expected_discount
+    ):
+        """Test stackable promotions only layer on the best non-stackable one when allowed."""
+        Promotion.objects.create(
+            name='Weekday Deal',
+            discount_type=DiscountType.PERCENTAGE,
+            discount_value=Decimal('10.00'),
+            is_active=True,
+            valid_from=timezone.now() - timedelta(days=1),
+            valid_until=timezone.now() + timedelta(days=30),
+            priority=20,
+            stackable=False,
+        )
+        service = DiscountService()
+        result = service.calculate_order_discounts(
+            order_total=Decimal('100.00'), allow_stacking=allow_stacking,
+        )
+        assert [d.source_name for d in result.applied_discounts] == expected_names
+        assert result.total_discount == expected_discount
+
     def test_calculate_discounted_total_not_negative(self, db):
         """Test discounted total is never negative."""
         coupon = Coupon.objects.create(
@@ -361,3 +500,18 @@ class TestRecordCouponUsage:
         service = DiscountService()
         success = service.record_coupon_usage('INVALID')
         assert success is False
+
+    def test_record_usages_scoped_to_hub(self, coupon):
+        """Test batched usages resolve codes within one hub and keep amounts."""
+        service = DiscountService()
+        recorded = service.record_coupon_usages(coupon.hub_id, [
+            (' test10 ', 'cust-123', 'sale-1', Decimal('5.00'), Decimal('50.00')),
+            ('INVALID', None, None, Decimal('1.00'), Decimal('10.00')),
+        ])
+        assert recorded == 1
+        usage = DiscountUsage.objects.get(coupon=coupon)
+        assert usage.amount_discounted == Decimal('5.00')
+        assert usage.original_amount == Decimal('50.00')
+        assert service.record_coupon_usages(uuid.uuid4(), [
+            ('TEST10', None, None, Decimal('1.00'), Decimal('10.00')),
+        ]) == 0
@@ -6,86 +6,54 @@ Tests URL routing, API endpoints, and authentication.
 
 import pytest
 import json
+import uuid
+from datetime import datetime, time as dt_time
 from decimal import Decimal
+from types import SimpleNamespace
 
 from django.urls import resolve
 
 from discounts import views
-from discounts.models import Coupon, Promotion
+from discounts.models import Coupon, DiscountUsage, Promotion
 
 
 # ==============================================================================
 # URL ROUTING TESTS
 # ==============================================================================
 
-@pytest.mark.django_db
+# Resolved once per module: the URLconf does not change during the session.
+URL_ROUTES = (
+    ('/modules/discounts/coupons/', views.coupon_list),
+    ('/modules/discounts/coupons/new/', views.coupon_create),
+    ('/modules/discounts/coupons/00000000-0000-0000-0000-000000000001/', views.coupon_detail),
+    ('/modules/discounts/coupons/00000000-0000-0000-0000-000000000001/edit/', views.coupon_edit),
+    ('/modules/discounts/coupons/00000000-0000-0000-0000-000000000001/delete/', views.coupon_delete),
+    ('/modules/discounts/coupons/00000000-0000-0000-0000-000000000001/toggle/', views.coupon_toggle),
+    ('/modules/discounts/promotions/', views.promotion_list),
+    ('/modules/discounts/promotions/new/', views.promotion_create),
+    ('/modules/discounts/promotions/00000000-0000-0000-0000-000000000001/', views.promotion_detail),
+    ('/modules/discounts/promotions/00000000-0000-0000-0000-000000000001/edit/', views.promotion_edit),
+    ('/modules/discounts/api/validate-coupon/', views.api_validate_coupon),
+    ('/modules/discounts/api/active-promotions/', views.api_active_promotions),
+    ('/modules/discounts/api/calculate-discounts/', views.api_calculate_discounts),
+)
+
+
+@pytest.fixture(scope='module')
+def resolved_urls():
+    """Resolve every routed path once for the whole module."""
+    return {path: resolve(path) for path, _ in URL_ROUTES}
+
+
 class TestURLRouting:
     """Tests for URL routing and resolution."""
 
-    def test_coupon_list_url_resolves(self):
-        """Test coupon list URL resolves."""
-        resolver = resolve('/modules/discounts/coupons/')
-        assert resolver.func == views.coupon_list
-
-    def test_coupon_create_url_resolves(self):
-        """Test coupon create URL resolves."""
-        resolver = resolve('/modules/discounts/coupons/new/')
-        assert resolver.func == views.coupon_create
-
-    def test_coupon_detail_url_resolves(self):
-        """Test coupon detail URL resolves."""
-        resolver = resolve('/modules/discounts/coupons/00000000-0000-0000-0000-000000000001/')
-        assert resolver.func == views.coupon_detail
-
-    def test_coupon_edit_url_resolves(self):
-        """Test coupon edit URL resolves."""
-        resolver = resolve('/modules/discounts/coupons/00000000-0000-0000-0000-000000000001/edit/')
-        assert resolver.func == views.coupon_edit
-
-    def test_coupon_delete_url_resolves(self):
-        """Test coupon delete URL resolves."""
-        resolver = resolve('/modules/discounts/coupons/00000000-0000-0000-0000-000000000001/delete/')
-        assert resolver.func == views.coupon_delete
-
-    def test_coupon_toggle_url_resolves(self):
-        """Test coupon toggle URL resolves."""
-        resolver = resolve('/modules/discounts/coupons/00000000-0000-0000-0000-000000000001/toggle/')
-        assert resolver.func == views.coupon_toggle
-
-    def test_promotion_list_url_resolves(self):
-        """Test promotion list URL resolves."""
-        resolver = resolve('/modules/discounts/promotions/')
-        assert resolver.func == views.promotion_list
-
-    def test_promotion_create_url_resolves(self):
-        """Test promotion create URL resolves."""
-        resolver = resolve('/modules/discounts/promotions/new/')
-        assert resolver.func == views.promotion_create
-
-    def test_promotion_detail_url_resolves(self):
-        """Test promotion detail URL resolves."""
-        resolver = resolve('/modules/discounts/promotions/00000000-0000-0000-0000-000000000001/')
-        assert resolver.func == views.promotion_detail
-
-    def test_promotion_edit_url_resolves(self):
-        """Test promotion edit URL resolves."""
-        resolver = resolve('/modules/discounts/promotions/00000000-0000-0000-0000-000000000001/edit/')
-        assert resolver.func == views.promotion_edit
-
-    def test_api_validate_coupon_url_resolves(self):
-        """Test API validate coupon URL resolves."""
-        resolver = resolve('/modules/discounts/api/validate-coupon/')
-        assert resolver.func == views.api_validate_coupon
-
-    def test_api_active_promotions_url_resolves(self):
-        """Test API active promotions URL resolves."""
-        resolver = resolve('/modules/discounts/api/active-promotions/')
-        assert resolver.func == views.api_active_promotions
-
-    def test_api_calculate_discounts_url_resolves(self):
-        """Test API calculate discounts URL resolves."""
-        resolver = resolve('/modules/discounts/api/calculate-discounts/')
-        assert resolver.func == views.api_calculate_discounts
+    @pytest.mark.parametrize(
+        'path,view', URL_ROUTES, ids=[view.__name__ for _, view in URL_ROUTES],
+    )
+    def test_url_resolves(self, resolved_urls, path, view):
+        """Test each routed URL resolves to its view."""
+        assert resolved_urls[path].func is view
 
 
 # ==============================================================================
@@ -152,6 +120,12 @@ class TestAPIEndpoints:
         assert 'promotions' in data
         assert isinstance(data['promotions'], list)
 
+    def test_api_active_promotions_reports_validity(self, auth_client, promotion):
+        """Test API active promotions serializes the SQL-computed is_valid flag."""
+        response = auth_client.get('/modules/discounts/api/active-promotions/')
+        data = json.loads(response.content)
+        assert [p['is_valid'] for p in data['promotions']] == [promotion.is_valid]
+
     def test_api_calculate_discounts(self, auth_client, coupon):
         """Test API calculate discounts."""
         response = auth_client.post(
@@ -168,6 +142,29 @@ class TestAPIEndpoints:
         assert 'discounted_total' in data
         assert 'total_discount' in data
 
+    def test_coupon_lookup_cache_invalidated_on_save(self, coupon):
+        """Test the cached coupon-by-code lookup is refreshed after a write."""
+        assert views._coupon_by_code(coupon.hub_id, 'test10') == coupon
+        coupon.is_active = False
+        coupon.save()
+        assert views._coupon_by_code(coupon.hub_id, 'TEST10').is_active is False
+
+    def test_api_calculate_discounts_reuses_cached_preview(self, auth_client, coupon):
+        """Test identical previews return the same payload."""
+        body = json.dumps({'total': '100.00', 'coupon_code': 'TEST10'})
+        url = '/modules/discounts/api/calculate-discounts/'
+        first = auth_client.post(url, body, content_type='application/json')
+        second = auth_client.post(url, body, content_type='application/json')
+        assert second.status_code == 200
+        assert json.loads(second.content) == json.loads(first.content)
+
+    def test_live_promotions_cached_across_totals(self, promotion, django_assert_num_queries):
+        """Test the live-promotion list is loaded once and then served from cache."""
+        first = views._live_promotions(promotion.hub_id)
+        with django_assert_num_queries(0):
+            second = views._live_promotions(promotion.hub_id)
+        assert [p.id for p in second] == [p.id for p in first] == [promotion.id]
+
     def test_api_calculate_discounts_invalid_json(self, auth_client, store_config):
         """Test API calculate discounts with invalid JSON."""
         response = auth_client.post(
@@ -177,6 +174,19 @@ class TestAPIEndpoints:
         )
         assert response.status_code == 400
 
+    def test_api_apply_discount_records_coupon_usage(self, auth_client, coupon):
+        """Test applying a coupon bumps its counter and logs one usage."""
+        response = auth_client.post('/modules/discounts/api/apply-discount/', {
+            'discount_id': str(coupon.id),
+            'source': 'coupon',
+            'original_amount': '100.00',
+            'discount_amount': '10.00',
+        })
+        assert response.status_code == 200
+        coupon.refresh_from_db()
+        assert coupon.usage_count == 1
+        assert DiscountUsage.objects.filter(coupon=coupon, amount_discounted=Decimal('10.00')).count() == 1
+
 
 # ==============================================================================
 # COUPON MANAGEMENT TESTS
@@ -204,6 +214,23 @@ class TestCouponManagement:
         assert data['success'] is True
         assert data['is_active'] is True
 
+    def test_toggle_coupon_htmx_renders_list_partial(self, auth_client, coupon):
+        """Test HTMX toggles get the list partial instead of JSON."""
+        response = auth_client.post(
+            f'/modules/discounts/coupons/{coupon.id}/toggle/', HTTP_HX_REQUEST='true',
+        )
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/html')
+
+    def test_export_coupons_csv_streams(self, auth_client, coupon):
+        """Test the CSV export is streamed with a header row first."""
+        response = auth_client.get('/modules/discounts/coupons/?export=csv')
+        assert response.status_code == 200
+        assert response.streaming
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        assert lines[0].startswith('Code,Name')
+        assert lines[1].startswith('TEST10,')
+
     def test_delete_coupon(self, auth_client, coupon):
         """Test deleting a coupon."""
         coupon_id = coupon.id
@@ -214,6 +241,23 @@ class TestCouponManagement:
         assert not Coupon.objects.filter(id=coupon_id).exists()
 
 
+    def test_toggle_unknown_coupon_returns_404(self, auth_client):
+        """Test toggling a missing coupon is a 404."""
+        response = auth_client.post(f'/modules/discounts/coupons/{uuid.uuid4()}/toggle/')
+        assert response.status_code == 404
+
+    def test_delete_unknown_coupon_returns_404(self, auth_client):
+        """Test deleting a missing coupon is a 404 without touching any row."""
+        response = auth_client.post(f'/modules/discounts/coupons/{uuid.uuid4()}/delete/')
+        assert response.status_code == 404
+
+    def test_settings_counts_active_coupons(self, auth_client, coupon, inactive_coupon):
+        """Test the settings page reports total and active coupons."""
+        response = auth_client.get('/modules/discounts/settings/')
+        assert response.status_code == 200
+        assert response.context['total_coupons'] == 2
+        assert response.context['active_coupons'] == 1
+
 # ==============================================================================
 # PROMOTION MANAGEMENT TESTS
 # ==============================================================================
@@ -231,6 +275,24 @@ class TestPromotionManagement:
         assert data['success'] is True
         assert data['is_active'] != initial_status
 
+    def test_toggle_promotion_htmx_swaps_only_its_row(self, auth_client, promotion):
+        """Test HTMX toggles return an out-of-band row instead of the list."""
+        response = auth_client.post(
+            f'/modules/discounts/promotions/{promotion.id}/toggle/', HTTP_HX_REQUEST='true',
+        )
+        assert response.status_code == 200
+        assert response['HX-Reswap'] == 'none'
+        assert f'id="promo-row-{promotion.id}"' in response.content.decode()
+
+    def test_export_promotions_csv_streams(self, auth_client, promotion):
+        """Test the promotions CSV export is streamed with a header row first."""
+        response = auth_client.get('/modules/discounts/promotions/?export=csv')
+        assert response.status_code == 200
+        assert response.streaming
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        assert lines[0].startswith('Name,Discount Type')
+        assert lines[1].startswith('Summer Sale,')
+
     def test_delete_promotion(self, auth_client, promotion):
         """Test deleting a promotion."""
         promotion_id = promotion.id
@@ -239,3 +301,110 @@ class TestPromotionManagement:
         data = json.loads(response.content)
         assert data['success'] is True
         assert not Promotion.objects.filter(id=promotion_id).exists()
+
+
+# ==============================================================================
+# FORM PARSING TESTS
+# ==============================================================================
+
+class TestPostFieldSpecs:
+    """Tests for the declarative POST -> model field specs."""
+
+    def test_coupon_spec_coerces_and_keeps_blank_fields(self):
+        """Test values are coerced and blank 'if given' fields are left alone."""
+        coupon = SimpleNamespace(buy_quantity=3)
+        views._apply_post(coupon, {
+            'code': ' spring ',
+            'discount_value': '15.50',
+            'usage_limit': '',
+            'valid_until': '2026-12-31T23:59',
+            'stackable': 'on',
+        }, views.COUPON_POST_FIELDS)
+        assert coupon.code == 'SPRING'
+        assert coupon.discount_value == Decimal('15.50')
+        assert coupon.usage_limit is None
+        assert coupon.min_purchase == Decimal('0')
+        assert coupon.usage_per_customer == 1
+        assert coupon.valid_until == datetime(2026, 12, 31, 23, 59)
+        assert coupon.stackable is True
+        assert coupon.is_active is False
+        assert coupon.buy_quantity == 3
+        assert not hasattr(coupon, 'valid_from')
+
+    def test_promotion_spec_parses_clock_times(self):
+        """Test HH:MM inputs become times and blank ones become None."""
+        promotion = SimpleNamespace()
+        views._apply_post(promotion, {
+            'valid_from': '2026-06-01T00:00',
+            'valid_until': '2026-06-30T23:59',
+            'start_time': '09:30',
+            'end_time': '',
+        }, views.PROMOTION_POST_FIELDS)
+        assert promotion.start_time == dt_time(9, 30)
+        assert promotion.end_time is None
+
+
+class TestFirstPage:
+    """Tests for the count-free first page used after mutations."""
+
+    def test_short_list_is_counted_from_fetched_rows(self):
+        """Test a list shorter than one page needs no COUNT query."""
+        page = views._first_page(list(range(4)), 10, 'coupons', None)
+        assert list(page.object_list) == [0, 1, 2, 3]
+        assert page.paginator.count == 4
+        assert page.has_next() is False
+
+
+class TestWindowPage:
+    """Tests for the count-free WindowPage."""
+
+    def test_window_detects_next_page_from_probe_row(self):
+        """Test one extra row is enough to know a next page exists."""
+        page = views.WindowPage(list(range(25)), 10, 2)
+        assert list(page) == list(range(10, 20))
+        assert page.has_next() is True
+        assert page.has_previous() is True
+        assert (page.start_index(), page.end_index()) == (11, 20)
+
+    def test_last_window_has_no_next_page(self):
+        """Test the final window reports no next page."""
+        page = views.WindowPage(list(range(25)), 10, 3)
+        assert list(page) == [20, 21, 22, 23, 24]
+        assert page.has_next() is False
+
+    def test_cursor_round_trips_and_rejects_garbage(self):
+        """Test keyset cursors decode to what was encoded and bad tokens are ignored."""
+        token = views._encode_cursor('name', 'Summer Sale', 'abc', 10)
+        assert views._decode_cursor(token, 'name') == ('Summer Sale', 'abc', 10)
+        assert views._decode_cursor('not-a-cursor', 'name') is None
+
+    def test_cursor_from_another_sort_is_dropped(self):
+        """Test a cursor minted under one order_by is ignored under another."""
+        token = views._encode_cursor('name', 'Summer Sale', 'abc', 10)
+        assert views._decode_cursor(token, '-created_at') is None
+        assert views._decode_cursor(token, '-name') is None
+
+    def test_malformed_cursor_pk_falls_back_to_first_page(self, promotion):
+        """Test a cursor pk that is not a UUID restarts at page 1 instead of erroring."""
+        queryset = Promotion.objects.filter(pk=promotion.pk).order_by('name', 'pk')
+        page = views.WindowPage(
+            queryset, 10, seek='name', cursor=('Summer Sale', 'not-a-uuid', 10),
+        )
+        assert list(page) == [promotion]
+        assert page.number == 1
+        assert page.start_index() == 1
+
+
+class TestToDecimal:
+    """Tests for POS amount coercion."""
+
+    @pytest.mark.parametrize('raw, expected', [
+        (None, Decimal('0')),
+        ('', Decimal('0')),
+        ('12.50', Decimal('12.50')),
+        (12, Decimal('12')),
+        (0.1, Decimal('0.1')),
+    ])
+    def test_to_decimal(self, raw, expected):
+        """Test blanks default to zero and floats convert via their repr."""
+        assert views._to_decimal(raw) == expected
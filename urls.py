@@ -1,30 +1,50 @@
-from django.urls import path
+from django.urls import include, path
 from django.views.generic import RedirectView
 from . import views
 
 app_name = 'discounts'
 
+# Grouped by prefix so a request only scans the patterns of its own branch.
+coupon_patterns = [
+    path('', views.coupon_list, name='coupon_list'),
+    path('new/', views.coupon_create, name='coupon_create'),
+    path('<uuid:coupon_id>/', include([
+        path('', views.coupon_detail, name='coupon_detail'),
+        path('edit/', views.coupon_edit, name='coupon_edit'),
+        path('delete/', views.coupon_delete, name='coupon_delete'),
+        path('toggle/', views.coupon_toggle, name='coupon_toggle'),
+        path('conditions/add/', views.condition_add, name='coupon_condition_add', kwargs={'promotion_id': None}),
+    ])),
+]
+
+promotion_patterns = [
+    path('', views.promotion_list, name='promotion_list'),
+    path('new/', views.promotion_create, name='promotion_create'),
+    path('<uuid:promotion_id>/', include([
+        path('', views.promotion_detail, name='promotion_detail'),
+        path('edit/', views.promotion_edit, name='promotion_edit'),
+        path('delete/', views.promotion_delete, name='promotion_delete'),
+        path('toggle/', views.promotion_toggle, name='promotion_toggle'),
+        path('conditions/add/', views.condition_add, name='promotion_condition_add', kwargs={'coupon_id': None}),
+    ])),
+]
+
+api_patterns = [
+    path('validate-coupon/', views.api_validate_coupon, name='api_validate_coupon'),
+    path('active-promotions/', views.api_active_promotions, name='api_active_promotions'),
+    path('calculate-discounts/', views.api_calculate_discounts, name='api_calculate_discounts'),
+    path('apply-discount/', views.api_apply_discount, name='api_apply_discount'),
+]
+
 urlpatterns = [
     # Root redirect (dashboard tab → usage report)
     path('', RedirectView.as_view(pattern_name='discounts:usage_report', permanent=False), name='index'),
 
     # Coupons
-    path('coupons/', views.coupon_list, name='coupon_list'),
-    path('coupons/new/', views.coupon_create, name='coupon_create'),
-    path('coupons/<uuid:coupon_id>/', views.coupon_detail, name='coupon_detail'),
-    path('coupons/<uuid:coupon_id>/edit/', views.coupon_edit, name='coupon_edit'),
-    path('coupons/<uuid:coupon_id>/delete/', views.coupon_delete, name='coupon_delete'),
-    path('coupons/<uuid:coupon_id>/toggle/', views.coupon_toggle, name='coupon_toggle'),
-    path('coupons/<uuid:coupon_id>/conditions/add/', views.condition_add, name='coupon_condition_add', kwargs={'promotion_id': None}),
+    path('coupons/', include(coupon_patterns)),
 
     # Promotions
-    path('promotions/', views.promotion_list, name='promotion_list'),
-    path('promotions/new/', views.promotion_create, name='promotion_create'),
-    path('promotions/<uuid:promotion_id>/', views.promotion_detail, name='promotion_detail'),
-    path('promotions/<uuid:promotion_id>/edit/', views.promotion_edit, name='promotion_edit'),
-    path('promotions/<uuid:promotion_id>/delete/', views.promotion_delete, name='promotion_delete'),
-    path('promotions/<uuid:promotion_id>/toggle/', views.promotion_toggle, name='promotion_toggle'),
-    path('promotions/<uuid:promotion_id>/conditions/add/', views.condition_add, name='promotion_condition_add', kwargs={'coupon_id': None}),
+    path('promotions/', include(promotion_patterns)),
 
     # Conditions
     path('conditions/<uuid:condition_id>/delete/', views.condition_delete, name='condition_delete'),
@@ -35,9 +55,6 @@ urlpatterns = [
     # Settings
     path('settings/', views.settings_view, name='settings'),
 
-    # API
-    path('api/validate-coupon/', views.api_validate_coupon, name='api_validate_coupon'),
-    path('api/active-promotions/', views.api_active_promotions, name='api_active_promotions'),
-    path('api/calculate-discounts/', views.api_calculate_discounts, name='api_calculate_discounts'),
-    path('api/apply-discount/', views.api_apply_discount, name='api_apply_discount'),
+    # API (POS integration)
+    path('api/', include(api_patterns)),
 ]
@@ -4,34 +4,84 @@ Discounts Module Views
 Coupon and promotion management with datatable pattern, side panel CRUD,
 usage reporting, and POS API endpoints.
 """
+import base64
+import csv
+import hashlib
 import json
-from datetime import datetime
+import tempfile
+import time
+from datetime import datetime, time as dt_time
 from decimal import Decimal
 
-from django.core.paginator import Paginator
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
 from django.contrib import messages
-from django.db.models import Q, Sum, Count
-from django.http import JsonResponse
+from django.db import transaction
+from django.db.models import Case, DecimalField, Prefetch, Q, Sum, Count, Value, When
+from django.db.models.functions import Coalesce
+from django.http import (
+    FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, render as django_render
 from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 from django.views.decorators.http import require_POST, require_GET
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # pragma: no cover - falls back to the hub's exporter
+    Workbook = None
+
 from apps.accounts.decorators import login_required
 from apps.core.htmx import htmx_view
-from apps.core.services import export_to_csv, export_to_excel
+from apps.core.services import export_to_excel
 from apps.modules_runtime.navigation import with_module_nav
 
+from .caching import (
+    LIVE_PROMOTIONS_KEY, LIVE_PROMOTIONS_TTL, bump_version, multi_versioned_key, versioned_key,
+)
 from .models import (
-    Coupon, Promotion, DiscountCondition, DiscountUsage,
+    ZERO, Coupon, Promotion, DiscountCondition, DiscountUsage,
 )
+from .services.discount_service import PROMOTION_PRICING_FIELDS, get_discount_service
 
 
 # ---------------------------------------------------------------------------
 # Constants
 # ---------------------------------------------------------------------------
 
-PER_PAGE_CHOICES = [10, 25, 50, 100]
+PER_PAGE_CHOICES = frozenset((10, 25, 50, 100))
+
+# ?status= values understood by the datatables; Q objects are reusable
+STATUS_FILTERS = {
+    'active': Q(is_active=True),
+    'inactive': Q(is_active=False),
+}
+
+# Seconds a datatable row count stays cached (writes invalidate it earlier)
+COUNT_CACHE_TTL = 60
+
+# Seconds the POS active-promotions payload stays cached
+ACTIVE_PROMOTIONS_CACHE_TTL = 30
+
+# Seconds a POS coupon-by-code lookup stays cached (coupon writes invalidate it)
+COUPON_LOOKUP_CACHE_TTL = 30
+
+# Seconds a POS discount preview is reused for identical cart inputs; also the
+# time bucket, so schedule boundaries are picked up without explicit invalidation.
+# Kept equal to the live-promotions hint TTL: a preview computed from a stale
+# "nothing live" hint can outlive it by one bucket, so a promotion entering its
+# window shows up in previews within LIVE_PROMOTIONS_TTL + CALCULATE_CACHE_TTL
+# seconds. Promotion and coupon writes invalidate both immediately.
+CALCULATE_CACHE_TTL = LIVE_PROMOTIONS_TTL
 
 COUPON_SORT_FIELDS = {
     'code': 'code',
@@ -48,6 +98,33 @@ PROMOTION_SORT_FIELDS = {
 }
 
 
+def _order_by_table(sort_fields, default):
+    """Map every ``(sort, dir)`` pair to its order_by string; ``None`` is the default."""
+    table = {None: default}
+    for key, column in sort_fields.items():
+        table[(key, 'asc')] = column
+        table[(key, 'desc')] = f'-{column}'
+    return table
+
+
+# (sort, dir) -> order_by, built once at import; unknown pairs use the default
+COUPON_ORDER_BY = _order_by_table(COUPON_SORT_FIELDS, '-created_at')
+PROMOTION_ORDER_BY = _order_by_table(PROMOTION_SORT_FIELDS, 'name')
+
+# Columns rendered by the datatables and their exports
+COUPON_LIST_FIELDS = (
+    'id', 'code', 'name', 'discount_type', 'discount_value', 'scope',
+    'buy_quantity', 'get_quantity', 'usage_count', 'usage_limit',
+    'valid_from', 'valid_until', 'is_active',
+)
+
+PROMOTION_LIST_FIELDS = (
+    'id', 'name', 'discount_type', 'discount_value', 'scope',
+    'buy_quantity', 'get_quantity', 'days_of_week', 'start_time', 'end_time',
+    'valid_from', 'valid_until', 'priority', 'stackable', 'is_active',
+)
+
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
@@ -56,11 +133,317 @@ def _hub_id(request):
     return request.session.get('hub_id')
 
 
+def _per_page(request):
+    """Requested page size, or 10 when it is missing, malformed or not offered."""
+    try:
+        per_page = int(request.GET.get('per_page', 10))
+    except ValueError:
+        return 10
+    return per_page if per_page in PER_PAGE_CHOICES else 10
+
+
+def _to_decimal(value, default=ZERO):
+    """
+    Coerce a form or JSON amount to Decimal, returning ``default`` when blank.
+
+    Decimals pass through untouched and ints convert exactly; only floats
+    (as JSON decoders produce) go through their shortest repr.
+    """
+    if value is None or value == '':
+        return default
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    return Decimal(value)
+
+
+def _json_default(value):
+    # orjson has no native Decimal support (unlike UUID and datetime), so
+    # every Decimal in a _json_response payload relies on this hook.
+    if isinstance(value, Decimal):
+        return format(value, 'f')
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _coupon_by_code(hub, code):
+    """
+    Return the hub's coupon for ``code`` (any case), or ``None``.
+
+    The instance is cached under the hub's coupon version, so any coupon
+    write, including ``increment_usage``, forces a fresh read.
+    """
+    code = code.strip().upper()
+    key = versioned_key('coupons', hub, 'by_code', hashlib.md5(code.encode()).hexdigest())
+    coupon = cache.get(key)
+    if coupon is None:
+        coupon = Coupon.objects.filter(
+            hub_id=hub, code=code, is_deleted=False,
+        ).first()
+        if coupon is not None:
+            cache.set(key, coupon, COUPON_LOOKUP_CACHE_TTL)
+    return coupon
+
+
+def _live_promotions(hub):
+    """
+    Return the hub's currently valid promotions, highest priority first.
+
+    The list is cached per ``CALCULATE_CACHE_TTL`` time bucket under the
+    hub's promotion version, so previews with different cart totals share
+    one query and any promotion write or schedule boundary refreshes it.
+    """
+    key = versioned_key('promotions', hub, 'live', int(time.time() // CALCULATE_CACHE_TTL))
+    promotions = cache.get(key)
+    if promotions is None:
+        promotions = list(Promotion.with_validity(
+            Promotion.objects.filter(hub_id=hub, is_deleted=False),
+        ).filter(computed_is_valid=True).only(
+            *PROMOTION_PRICING_FIELDS,
+        ).order_by('-priority'))
+        cache.set(key, promotions, CALCULATE_CACHE_TTL)
+    return promotions
+
+
+# Request bodies are parsed by orjson when it is installed
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+
+def _json_response(payload, status=200):
+    """
+    JsonResponse equivalent that encodes with orjson when it is installed.
+
+    UUIDs and datetimes are serialized natively in C; Decimals go through
+    ``_json_default``. Falls back to Django's encoder otherwise.
+    """
+    if orjson is None:
+        return JsonResponse(payload, status=status)
+    return HttpResponse(
+        orjson.dumps(payload, default=_json_default),
+        status=status, content_type='application/json',
+    )
+
+
+class _Echo:
+    """File-like sink for ``csv.writer`` that hands each line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def _export_values(obj, fields, field_formatters):
+    """One export row: each field, formatted when a formatter is given."""
+    values = []
+    for field in fields:
+        value = getattr(obj, field)
+        formatter = field_formatters.get(field)
+        if formatter is not None:
+            value = formatter(value)
+        values.append('' if value is None else value)
+    return values
+
+
+def _export_csv_stream(rows, fields, headers, field_formatters, filename):
+    """
+    CSV export that streams ``rows`` to the client as they are read.
+
+    Nothing is buffered beyond the current row, so memory stays flat and
+    the download starts with the first chunk from the database cursor.
+    """
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(headers)
+        for obj in rows:
+            yield writer.writerow(_export_values(obj, fields, field_formatters))
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _export_xlsx_stream(rows, fields, headers, field_formatters, filename, sheet_name):
+    """
+    XLSX export built with openpyxl's write-only workbook.
+
+    Rows are serialized to the sheet XML as they are appended instead of
+    being kept as cell objects, and the finished file is spooled to disk
+    and streamed from there. Without openpyxl the hub's exporter is used.
+    """
+    if Workbook is None:
+        return export_to_excel(
+            rows, fields=fields, headers=headers, field_formatters=field_formatters,
+            filename=filename, sheet_name=sheet_name,
+        )
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append(headers)
+    for obj in rows:
+        sheet.append(_export_values(obj, fields, field_formatters))
+    handle = tempfile.TemporaryFile()
+    workbook.save(handle)
+    handle.seek(0)
+    return FileResponse(
+        handle, as_attachment=True, filename=filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator that caches the COUNT(*) of its queryset.
+
+    The key combines the hub's cache version for ``namespace`` with a hash
+    of the SQL, so each filter/search combination is counted once per TTL
+    and any write to the namespace invalidates all of them.
+    """
+
+    def __init__(self, object_list, per_page, namespace, hub_id, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.namespace = namespace
+        self.hub_id = hub_id
+
+    @cached_property
+    def count(self):
+        digest = hashlib.md5(str(self.object_list.query).encode()).hexdigest()
+        key = versioned_key(self.namespace, self.hub_id, 'count', digest)
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, COUNT_CACHE_TTL)
+        return count
+
+
+def _first_page(queryset, per_page, namespace, hub_id):
+    """
+    Page 1 of ``queryset`` from a single ``LIMIT per_page + 1`` query.
+
+    When the extra row is absent the fetched rows are the whole result, so
+    the total is known without a COUNT(*). Only longer lists fall back to
+    ``CachedCountPaginator`` for the total the footer displays.
+    """
+    rows = list(queryset[:per_page + 1])
+    if len(rows) <= per_page:
+        return Paginator(rows, per_page).page(1)
+    paginator = CachedCountPaginator(queryset, per_page, namespace, hub_id)
+    return Page(rows[:per_page], 1, paginator)
+
+
+def _encode_cursor(order_by, value, pk, offset):
+    """Opaque ``?after=`` token: the sort key, last row's sort value, pk and position."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([order_by, str(value), str(pk), offset])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(token, order_by):
+    """
+    Inverse of ``_encode_cursor``.
+
+    ``None`` for a missing or tampered token, or one minted under a
+    different ``order_by`` (its value would not compare against this
+    sort column).
+    """
+    if not token:
+        return None
+    try:
+        sort, value, pk, offset = json.loads(base64.urlsafe_b64decode(token.encode()))
+        offset = int(offset)
+    except (ValueError, TypeError):
+        return None
+    if sort != order_by:
+        return None
+    return value, pk, offset
+
+
+def _seek_q(order_by, value, pk):
+    """Rows strictly after ``(value, pk)`` in ``order_by, pk`` order."""
+    column = order_by.lstrip('-')
+    op = 'lt' if order_by.startswith('-') else 'gt'
+    return Q(**{f'{column}__{op}': value}) | Q(**{column: value, f'pk__{op}': pk})
+
+
+class WindowPage:
+    """
+    Page-like window over ``queryset`` that never runs COUNT(*).
+
+    One ``LIMIT per_page + 1`` query fetches the page plus a probe row for
+    ``has_next``; templates check ``windowed`` to render prev/next only,
+    since the total and page count are unknown.
+
+    With ``seek`` (the queryset's primary order_by, tie-broken on pk), the
+    next page is addressed by ``next_cursor`` and resumed with a keyset
+    filter from ``cursor`` instead of an OFFSET that would rescan every
+    earlier row. A cursor whose value or pk does not fit the column falls
+    back to the first page.
+    """
+
+    windowed = True
+
+    def __init__(self, queryset, per_page, number=1, seek=None, cursor=None):
+        self.seek = seek
+        rows = None
+        if cursor is not None:
+            value, pk, self.offset = cursor
+            try:
+                rows = list(queryset.filter(_seek_q(seek, value, pk))[:per_page + 1])
+            except (ValueError, TypeError, ValidationError):
+                number = 1
+        if rows is None:
+            self.offset = (number - 1) * per_page
+            rows = list(queryset[self.offset:self.offset + per_page + 1])
+        self.number = self.offset // per_page + 1
+        self.object_list = rows[:per_page]
+        self._has_next = len(rows) > per_page
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def start_index(self):
+        return self.offset + 1 if self.object_list else 0
+
+    def end_index(self):
+        return self.offset + len(self.object_list)
+
+    def next_cursor(self):
+        if self.seek is None or not self._has_next:
+            return ''
+        last = self.object_list[-1]
+        return _encode_cursor(
+            self.seek, getattr(last, self.seek.lstrip('-')), last.pk, self.end_index(),
+        )
+
+
+def _page_number(request):
+    """Requested 1-based page number, or 1 when it is missing or malformed."""
+    try:
+        return max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        return 1
+
+
 def _render_coupon_list(request, hub):
     """Render the coupons list partial after a mutation."""
-    coupons = Coupon.objects.filter(hub_id=hub, is_deleted=False).order_by('-created_at')
-    paginator = Paginator(coupons, 10)
-    page_obj = paginator.get_page(1)
+    coupons = Coupon.objects.filter(hub_id=hub, is_deleted=False).only(
+        *COUPON_LIST_FIELDS,
+    ).order_by('-created_at')
+    page_obj = _first_page(coupons, 10, 'coupons', hub)
     return django_render(request, 'discounts/partials/coupons_list.html', {
         'coupons': page_obj,
         'page_obj': page_obj,
@@ -74,9 +457,10 @@ def _render_coupon_list(request, hub):
 
 def _render_promotion_list(request, hub):
     """Render the promotions list partial after a mutation."""
-    promotions = Promotion.objects.filter(hub_id=hub, is_deleted=False).order_by('-priority', '-created_at')
-    paginator = Paginator(promotions, 10)
-    page_obj = paginator.get_page(1)
+    promotions = Promotion.objects.filter(hub_id=hub, is_deleted=False).only(
+        *PROMOTION_LIST_FIELDS,
+    ).order_by('-priority', '-created_at')
+    page_obj = _first_page(promotions, 10, 'promotions', hub)
     return django_render(request, 'discounts/partials/promotions_list.html', {
         'promotions': page_obj,
         'page_obj': page_obj,
@@ -88,93 +472,174 @@ def _render_promotion_list(request, hub):
     })
 
 
-def _save_coupon_from_post(request, coupon):
-    """Populate a Coupon instance from POST data and save it."""
-    data = request.POST
-    coupon.code = data.get('code', '').strip().upper()
-    coupon.name = data.get('name', '').strip()
-    coupon.description = data.get('description', '').strip()
-    coupon.discount_type = data.get('discount_type', 'percentage')
-    coupon.discount_value = Decimal(data.get('discount_value', '0'))
-    coupon.scope = data.get('scope', 'order')
-    coupon.min_purchase = Decimal(data.get('min_purchase', '0') or '0')
-
-    if data.get('max_discount'):
-        coupon.max_discount = Decimal(data['max_discount'])
-    else:
-        coupon.max_discount = None
+def _toggle_active(queryset):
+    """
+    Flip ``is_active`` on the row matched by ``queryset`` and return the new value.
 
-    if data.get('usage_limit'):
-        coupon.usage_limit = int(data['usage_limit'])
-    else:
-        coupon.usage_limit = None
+    The flip happens inside the UPDATE, so concurrent toggles never lose a
+    write, and only the boolean is read back. ``update()`` sends no signals;
+    callers bump their cache namespace. Raises Http404 when nothing matched.
+    """
+    with transaction.atomic():
+        flipped = queryset.update(
+            is_active=Case(When(is_active=True, then=Value(False)), default=Value(True)),
+            updated_at=timezone.now(),
+        )
+        if not flipped:
+            raise Http404
+        return queryset.values_list('is_active', flat=True).get()
 
-    coupon.usage_per_customer = int(data.get('usage_per_customer', '1') or '1')
 
-    if data.get('valid_from'):
-        coupon.valid_from = datetime.fromisoformat(data['valid_from'])
-    if data.get('valid_until'):
-        coupon.valid_until = datetime.fromisoformat(data['valid_until'])
-    else:
-        coupon.valid_until = None
+def _mutation_response(request, render, subject, message, **payload):
+    """
+    Answer a toggle/delete with ``render(request, subject)`` for HTMX, JSON otherwise.
 
-    coupon.priority = int(data.get('priority', '0') or '0')
-    coupon.stackable = data.get('stackable') == 'on'
-    coupon.is_active = data.get('is_active') == 'on'
+    POS and API callers only read the JSON flags, so they skip the list
+    query, pagination count and template render entirely.
+    """
+    if not request.htmx:
+        return JsonResponse({'success': True, **payload})
+    messages.success(request, message)
+    return render(request, subject)
 
-    if data.get('buy_quantity'):
-        coupon.buy_quantity = int(data['buy_quantity'])
-    if data.get('get_quantity'):
-        coupon.get_quantity = int(data['get_quantity'])
-    if data.get('get_discount_percent'):
-        coupon.get_discount_percent = Decimal(data['get_discount_percent'])
 
-    coupon.save()
+def _swap_promotion_row(request, promotion):
+    """
+    Replace only ``promotion``'s datatable row, out of band.
 
+    ``HX-Reswap: none`` leaves the ``#datatable-body`` the request targeted
+    untouched, so a single-row change needs no list query or page render.
+    """
+    response = django_render(request, 'discounts/partials/promotion_row_oob.html', {
+        'promotion': promotion,
+    })
+    response['HX-Reswap'] = 'none'
+    return response
 
-def _save_promotion_from_post(request, promotion):
-    """Populate a Promotion instance from POST data and save it."""
-    data = request.POST
-    promotion.name = data.get('name', '').strip()
-    promotion.description = data.get('description', '').strip()
-    promotion.discount_type = data.get('discount_type', 'percentage')
-    promotion.discount_value = Decimal(data.get('discount_value', '0'))
-    promotion.scope = data.get('scope', 'order')
-
-    if data.get('min_purchase'):
-        promotion.min_purchase = Decimal(data['min_purchase'])
-    else:
-        promotion.min_purchase = None
 
-    if data.get('max_discount'):
-        promotion.max_discount = Decimal(data['max_discount'])
-    else:
-        promotion.max_discount = None
+def _refresh_promotion_row(request, promotion_id):
+    """``_swap_promotion_row`` for a promotion that is not loaded yet."""
+    promotion = Promotion.objects.only(*PROMOTION_LIST_FIELDS).get(id=promotion_id)
+    return _swap_promotion_row(request, promotion)
 
-    promotion.valid_from = datetime.fromisoformat(data['valid_from'])
-    promotion.valid_until = datetime.fromisoformat(data['valid_until'])
 
-    promotion.days_of_week = data.get('days_of_week', '')
-    if data.get('start_time'):
-        promotion.start_time = datetime.strptime(data['start_time'], '%H:%M').time()
-    else:
-        promotion.start_time = None
-    if data.get('end_time'):
-        promotion.end_time = datetime.strptime(data['end_time'], '%H:%M').time()
-    else:
-        promotion.end_time = None
+def _drop_promotion_row(request, promotion_id):
+    """Remove a deleted promotion's datatable row, out of band."""
+    response = HttpResponse(format_html(
+        '<template><tr id="promo-row-{}" hx-swap-oob="delete"></tr></template>', promotion_id,
+    ))
+    response['HX-Reswap'] = 'none'
+    return response
+
+
+# ---------------------------------------------------------------------------
+# POST -> model field specs
+# ---------------------------------------------------------------------------
+
+_KEEP = object()  # coercer result meaning "leave the current value untouched"
+
+
+def _text(raw):
+    return (raw or '').strip()
 
-    promotion.priority = int(data.get('priority', '0') or '0')
-    promotion.stackable = data.get('stackable') == 'on'
-    promotion.is_active = data.get('is_active') == 'on'
 
-    if data.get('buy_quantity'):
-        promotion.buy_quantity = int(data['buy_quantity'])
-    if data.get('get_quantity'):
-        promotion.get_quantity = int(data['get_quantity'])
-    if data.get('get_discount_percent'):
-        promotion.get_discount_percent = Decimal(data['get_discount_percent'])
+def _upper_text(raw):
+    return _text(raw).upper()
 
+
+def _checkbox(raw):
+    return raw == 'on'
+
+
+def _choice(default):
+    return lambda raw: default if raw is None else raw
+
+
+def _decimal(default=ZERO):
+    """Blank input returns the shared ``default`` instead of parsing one."""
+    return lambda raw: Decimal(raw) if raw else default
+
+
+def _integer(default):
+    return lambda raw: int(raw) if raw else default
+
+
+def _optional(coerce):
+    """Blank input becomes ``None``; anything else goes through ``coerce``."""
+    return lambda raw: coerce(raw) if raw else None
+
+
+def _if_given(coerce):
+    """Blank input keeps the current value; anything else goes through ``coerce``."""
+    return lambda raw: coerce(raw) if raw else _KEEP
+
+
+def _clock_time(raw):
+    """Parse ``HH:MM`` directly; strptime goes through its regex/locale machinery."""
+    hour, minute = raw.split(':')
+    return dt_time(int(hour), int(minute))
+
+
+COUPON_POST_FIELDS = (
+    ('code', _upper_text),
+    ('name', _text),
+    ('description', _text),
+    ('discount_type', _choice('percentage')),
+    ('discount_value', _decimal()),
+    ('scope', _choice('order')),
+    ('min_purchase', _decimal()),
+    ('max_discount', _optional(Decimal)),
+    ('usage_limit', _optional(int)),
+    ('usage_per_customer', _integer(1)),
+    ('valid_from', _if_given(datetime.fromisoformat)),
+    ('valid_until', _optional(datetime.fromisoformat)),
+    ('priority', _integer(0)),
+    ('stackable', _checkbox),
+    ('is_active', _checkbox),
+    ('buy_quantity', _if_given(int)),
+    ('get_quantity', _if_given(int)),
+    ('get_discount_percent', _if_given(Decimal)),
+)
+
+PROMOTION_POST_FIELDS = (
+    ('name', _text),
+    ('description', _text),
+    ('discount_type', _choice('percentage')),
+    ('discount_value', _decimal()),
+    ('scope', _choice('order')),
+    ('min_purchase', _optional(Decimal)),
+    ('max_discount', _optional(Decimal)),
+    ('valid_from', datetime.fromisoformat),
+    ('valid_until', datetime.fromisoformat),
+    ('days_of_week', _choice('')),
+    ('start_time', _optional(_clock_time)),
+    ('end_time', _optional(_clock_time)),
+    ('priority', _integer(0)),
+    ('stackable', _checkbox),
+    ('is_active', _checkbox),
+    ('buy_quantity', _if_given(int)),
+    ('get_quantity', _if_given(int)),
+    ('get_discount_percent', _if_given(Decimal)),
+)
+
+
+def _apply_post(instance, data, spec):
+    """Copy POST ``data`` onto ``instance`` following a ``(field, coerce)`` spec."""
+    for name, coerce in spec:
+        value = coerce(data.get(name))
+        if value is not _KEEP:
+            setattr(instance, name, value)
+
+
+def _save_coupon_from_post(request, coupon):
+    """Populate a Coupon instance from POST data and save it."""
+    _apply_post(coupon, request.POST, COUPON_POST_FIELDS)
+    coupon.save()
+
+
+def _save_promotion_from_post(request, promotion):
+    """Populate a Promotion instance from POST data and save it."""
+    _apply_post(promotion, request.POST, PROMOTION_POST_FIELDS)
     promotion.save()
 
 
@@ -193,9 +658,7 @@ def coupon_list(request):
     sort_dir = request.GET.get('dir', 'desc')
     status_filter = request.GET.get('status', '')
     page_number = request.GET.get('page', 1)
-    per_page = int(request.GET.get('per_page', 10))
-    if per_page not in PER_PAGE_CHOICES:
-        per_page = 10
+    per_page = _per_page(request)
 
     coupons = Coupon.objects.filter(hub_id=hub, is_deleted=False)
 
@@ -206,16 +669,13 @@ def coupon_list(request):
         )
 
     # Status filter
-    if status_filter == 'active':
-        coupons = coupons.filter(is_active=True)
-    elif status_filter == 'inactive':
-        coupons = coupons.filter(is_active=False)
+    status_q = STATUS_FILTERS.get(status_filter)
+    if status_q is not None:
+        coupons = coupons.filter(status_q)
 
     # Sort
-    order_by = COUPON_SORT_FIELDS.get(sort_field, 'created_at')
-    if sort_dir == 'desc':
-        order_by = f'-{order_by}'
-    coupons = coupons.order_by(order_by)
+    order_by = COUPON_ORDER_BY.get((sort_field, sort_dir), COUPON_ORDER_BY[None])
+    coupons = coupons.only(*COUPON_LIST_FIELDS).order_by(order_by)
 
     # Export (before pagination -- exports all filtered results)
     export_format = request.GET.get('export')
@@ -235,15 +695,16 @@ def coupon_list(request):
             'valid_from': lambda v: v.strftime('%Y-%m-%d %H:%M') if v else '',
             'valid_until': lambda v: v.strftime('%Y-%m-%d %H:%M') if v else '',
         }
+        coupons = Coupon.batch_scan(coupons, chunk_size=2000)
         if export_format == 'csv':
-            return export_to_csv(
+            return _export_csv_stream(
                 coupons,
                 fields=export_fields,
                 headers=export_headers,
                 field_formatters=export_formatters,
                 filename='coupons.csv',
             )
-        return export_to_excel(
+        return _export_xlsx_stream(
             coupons,
             fields=export_fields,
             headers=export_headers,
@@ -253,7 +714,7 @@ def coupon_list(request):
         )
 
     # Pagination
-    paginator = Paginator(coupons, per_page)
+    paginator = CachedCountPaginator(coupons, per_page, 'coupons', hub)
     page_obj = paginator.get_page(page_number)
 
     context = {
@@ -279,12 +740,30 @@ def coupon_list(request):
 def coupon_detail(request, coupon_id):
     """Coupon detail page with conditions and usage history."""
     hub = _hub_id(request)
-    coupon = get_object_or_404(Coupon, id=coupon_id, hub_id=hub, is_deleted=False)
-    conditions = coupon.conditions.filter(is_deleted=False)
-    recent_usages = coupon.usages.filter(is_deleted=False).order_by('-used_at')[:10]
-    total_savings = coupon.usages.filter(is_deleted=False).aggregate(
-        total=Sum('amount_discounted')
-    )['total'] or Decimal('0.00')
+    # Lifetime savings is aggregated on the coupon row itself; conditions and
+    # the 10 most recent usages (with their customers) ride along as prefetches.
+    coupons = Coupon.objects.annotate(
+        savings_total=Coalesce(
+            Sum('usages__amount_discounted', filter=Q(usages__is_deleted=False)),
+            Value(ZERO), output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+    ).prefetch_related(
+        Prefetch(
+            'conditions',
+            queryset=DiscountCondition.objects.filter(is_deleted=False),
+            to_attr='active_conditions',
+        ),
+        Prefetch(
+            'usages',
+            queryset=DiscountUsage.objects.filter(is_deleted=False)
+            .select_related('customer').order_by('-used_at')[:10],
+            to_attr='recent_usages',
+        ),
+    )
+    coupon = get_object_or_404(coupons, id=coupon_id, hub_id=hub, is_deleted=False)
+    conditions = coupon.active_conditions
+    recent_usages = coupon.recent_usages
+    total_savings = coupon.savings_total
 
     return {
         'coupon': coupon,
@@ -334,27 +813,37 @@ def coupon_edit(request, coupon_id):
 @login_required
 @require_POST
 def coupon_delete(request, coupon_id):
-    """Soft-delete a coupon and return the updated list partial."""
+    """Soft-delete a coupon; HTMX gets the updated list partial, others JSON."""
     hub = _hub_id(request)
-    coupon = get_object_or_404(Coupon, id=coupon_id, hub_id=hub, is_deleted=False)
-    coupon.is_deleted = True
-    coupon.deleted_at = timezone.now()
-    coupon.save(update_fields=['is_deleted', 'deleted_at', 'updated_at'])
-    messages.success(request, _('Coupon deleted successfully'))
-    return _render_coupon_list(request, hub)
+    # One UPDATE instead of SELECT + save(); post_save does not fire, so the
+    # cache invalidation the signal handler would do happens here.
+    now = timezone.now()
+    deleted = Coupon.objects.filter(
+        id=coupon_id, hub_id=hub, is_deleted=False,
+    ).update(is_deleted=True, deleted_at=now, updated_at=now)
+    if not deleted:
+        raise Http404
+    bump_version('coupons', hub)
+    return _mutation_response(
+        request, _render_coupon_list, hub, _('Coupon deleted successfully'),
+    )
 
 
 @login_required
 @require_POST
 def coupon_toggle(request, coupon_id):
-    """Toggle coupon active status and return the updated list partial."""
+    """Toggle coupon active status; HTMX gets the updated list partial, others JSON."""
     hub = _hub_id(request)
-    coupon = get_object_or_404(Coupon, id=coupon_id, hub_id=hub, is_deleted=False)
-    coupon.is_active = not coupon.is_active
-    coupon.save(update_fields=['is_active', 'updated_at'])
-    status = _('activated') if coupon.is_active else _('deactivated')
-    messages.success(request, _('Coupon %(status)s successfully') % {'status': status})
-    return _render_coupon_list(request, hub)
+    is_active = _toggle_active(
+        Coupon.objects.filter(id=coupon_id, hub_id=hub, is_deleted=False),
+    )
+    bump_version('coupons', hub)
+    status = _('activated') if is_active else _('deactivated')
+    return _mutation_response(
+        request, _render_coupon_list, hub,
+        _('Coupon %(status)s successfully') % {'status': status},
+        is_active=is_active,
+    )
 
 
 # ============================================================================
@@ -372,9 +861,7 @@ def promotion_list(request):
     sort_dir = request.GET.get('dir', 'asc')
     status_filter = request.GET.get('status', '')
     page_number = request.GET.get('page', 1)
-    per_page = int(request.GET.get('per_page', 10))
-    if per_page not in PER_PAGE_CHOICES:
-        per_page = 10
+    per_page = _per_page(request)
 
     promotions = Promotion.objects.filter(hub_id=hub, is_deleted=False)
 
@@ -385,16 +872,13 @@ def promotion_list(request):
         )
 
     # Status filter
-    if status_filter == 'active':
-        promotions = promotions.filter(is_active=True)
-    elif status_filter == 'inactive':
-        promotions = promotions.filter(is_active=False)
+    status_q = STATUS_FILTERS.get(status_filter)
+    if status_q is not None:
+        promotions = promotions.filter(status_q)
 
     # Sort
-    order_by = PROMOTION_SORT_FIELDS.get(sort_field, 'name')
-    if sort_dir == 'desc':
-        order_by = f'-{order_by}'
-    promotions = promotions.order_by(order_by)
+    order_by = PROMOTION_ORDER_BY.get((sort_field, sort_dir), PROMOTION_ORDER_BY[None])
+    promotions = promotions.only(*PROMOTION_LIST_FIELDS).order_by(order_by)
 
     # Export (before pagination -- exports all filtered results)
     export_format = request.GET.get('export')
@@ -414,15 +898,16 @@ def promotion_list(request):
             'valid_from': lambda v: v.strftime('%Y-%m-%d %H:%M') if v else '',
             'valid_until': lambda v: v.strftime('%Y-%m-%d %H:%M') if v else '',
         }
+        promotions = promotions.iterator(chunk_size=2000)
         if export_format == 'csv':
-            return export_to_csv(
+            return _export_csv_stream(
                 promotions,
                 fields=export_fields,
                 headers=export_headers,
                 field_formatters=export_formatters,
                 filename='promotions.csv',
             )
-        return export_to_excel(
+        return _export_xlsx_stream(
             promotions,
             fields=export_fields,
             headers=export_headers,
@@ -432,8 +917,17 @@ def promotion_list(request):
         )
 
     # Pagination
-    paginator = Paginator(promotions, per_page)
-    page_obj = paginator.get_page(page_number)
+    # ?no_total=1: prev/next paging without counting the filtered rows; later
+    # pages are reached through ?after= keyset cursors rather than OFFSET
+    if request.GET.get('no_total') == '1':
+        page_obj = WindowPage(
+            promotions.order_by(order_by, '-pk' if order_by.startswith('-') else 'pk'),
+            per_page, _page_number(request),
+            seek=order_by, cursor=_decode_cursor(request.GET.get('after'), order_by),
+        )
+    else:
+        paginator = CachedCountPaginator(promotions, per_page, 'promotions', hub)
+        page_obj = paginator.get_page(page_number)
 
     context = {
         'promotions': page_obj,
@@ -460,7 +954,9 @@ def promotion_detail(request, promotion_id):
     hub = _hub_id(request)
     promotion = get_object_or_404(Promotion, id=promotion_id, hub_id=hub, is_deleted=False)
     conditions = promotion.conditions.filter(is_deleted=False)
-    recent_usages = promotion.usages.filter(is_deleted=False).order_by('-used_at')[:10]
+    recent_usages = promotion.usages.filter(
+        is_deleted=False,
+    ).select_related('customer').order_by('-used_at')[:10]
 
     return {
         'promotion': promotion,
@@ -496,7 +992,7 @@ def promotion_edit(request, promotion_id):
     if request.method == 'POST':
         _save_promotion_from_post(request, promotion)
         messages.success(request, _('Promotion updated successfully'))
-        return _render_promotion_list(request, hub)
+        return _swap_promotion_row(request, promotion)
 
     # GET: render panel form
     return django_render(request, 'discounts/partials/panel_promotion_edit.html', {
@@ -509,27 +1005,39 @@ def promotion_edit(request, promotion_id):
 @login_required
 @require_POST
 def promotion_delete(request, promotion_id):
-    """Soft-delete a promotion and return the updated list partial."""
+    """Soft-delete a promotion; HTMX gets its row removed, others JSON."""
     hub = _hub_id(request)
-    promotion = get_object_or_404(Promotion, id=promotion_id, hub_id=hub, is_deleted=False)
-    promotion.is_deleted = True
-    promotion.deleted_at = timezone.now()
-    promotion.save(update_fields=['is_deleted', 'deleted_at', 'updated_at'])
-    messages.success(request, _('Promotion deleted successfully'))
-    return _render_promotion_list(request, hub)
+    # One UPDATE instead of SELECT + save(); post_save does not fire, so the
+    # cache invalidation the signal handler would do happens here.
+    now = timezone.now()
+    deleted = Promotion.objects.filter(
+        id=promotion_id, hub_id=hub, is_deleted=False,
+    ).update(is_deleted=True, deleted_at=now, updated_at=now)
+    if not deleted:
+        raise Http404
+    bump_version('promotions', hub)
+    cache.delete(LIVE_PROMOTIONS_KEY)
+    return _mutation_response(
+        request, _drop_promotion_row, promotion_id, _('Promotion deleted successfully'),
+    )
 
 
 @login_required
 @require_POST
 def promotion_toggle(request, promotion_id):
-    """Toggle promotion active status and return the updated list partial."""
+    """Toggle promotion active status; HTMX gets the refreshed row, others JSON."""
     hub = _hub_id(request)
-    promotion = get_object_or_404(Promotion, id=promotion_id, hub_id=hub, is_deleted=False)
-    promotion.is_active = not promotion.is_active
-    promotion.save(update_fields=['is_active', 'updated_at'])
-    status = _('activated') if promotion.is_active else _('deactivated')
-    messages.success(request, _('Promotion %(status)s successfully') % {'status': status})
-    return _render_promotion_list(request, hub)
+    is_active = _toggle_active(
+        Promotion.objects.filter(id=promotion_id, hub_id=hub, is_deleted=False),
+    )
+    bump_version('promotions', hub)
+    cache.delete(LIVE_PROMOTIONS_KEY)
+    status = _('activated') if is_active else _('deactivated')
+    return _mutation_response(
+        request, _refresh_promotion_row, promotion_id,
+        _('Promotion %(status)s successfully') % {'status': status},
+        is_active=is_active,
+    )
 
 
 # ============================================================================
@@ -541,13 +1049,18 @@ def promotion_toggle(request, promotion_id):
 def condition_add(request, coupon_id=None, promotion_id=None):
     hub = _hub_id(request)
 
+    # The parent is only checked for existence within the hub, so an EXISTS
+    # probe replaces loading the full row; the FK is set from the URL id.
     kwargs = {'hub_id': hub}
+    parents = None
     if coupon_id:
-        parent = get_object_or_404(Coupon, id=coupon_id, hub_id=hub, is_deleted=False)
-        kwargs['coupon'] = parent
+        parents = Coupon.objects.filter(id=coupon_id)
+        kwargs['coupon_id'] = coupon_id
     elif promotion_id:
-        parent = get_object_or_404(Promotion, id=promotion_id, hub_id=hub, is_deleted=False)
-        kwargs['promotion'] = parent
+        parents = Promotion.objects.filter(id=promotion_id)
+        kwargs['promotion_id'] = promotion_id
+    if parents is not None and not parents.filter(hub_id=hub, is_deleted=False).exists():
+        raise Http404
 
     DiscountCondition.objects.create(
         condition_type=request.POST.get('condition_type', ''),
@@ -562,10 +1075,12 @@ def condition_add(request, coupon_id=None, promotion_id=None):
 @require_POST
 def condition_delete(request, condition_id):
     hub = _hub_id(request)
-    condition = get_object_or_404(DiscountCondition, id=condition_id, hub_id=hub, is_deleted=False)
-    condition.is_deleted = True
-    condition.deleted_at = timezone.now()
-    condition.save(update_fields=['is_deleted', 'deleted_at', 'updated_at'])
+    now = timezone.now()
+    deleted = DiscountCondition.objects.filter(
+        id=condition_id, hub_id=hub, is_deleted=False,
+    ).update(is_deleted=True, deleted_at=now, updated_at=now)
+    if not deleted:
+        raise Http404
     return JsonResponse({'success': True})
 
 
@@ -581,19 +1096,21 @@ def usage_report(request):
     date_from = request.GET.get('date_from', '')
     date_to = request.GET.get('date_to', '')
 
-    usages = DiscountUsage.objects.filter(
+    usages = DiscountUsage.for_listing(DiscountUsage.objects.filter(
         hub_id=hub, is_deleted=False,
-    ).select_related('coupon', 'promotion', 'sale', 'customer').order_by('-used_at')
+    )).order_by('-used_at')
 
     if date_from:
         usages = usages.filter(used_at__date__gte=date_from)
     if date_to:
         usages = usages.filter(used_at__date__lte=date_to)
 
-    total_usages = usages.count()
-    total_savings = usages.aggregate(
-        total=Sum('amount_discounted')
-    )['total'] or Decimal('0.00')
+    totals = usages.aggregate(
+        count=Count('id'),
+        savings=Sum('amount_discounted'),
+    )
+    total_usages = totals['count']
+    total_savings = totals['savings'] or ZERO
 
     return {
         'usages': usages[:100],
@@ -613,14 +1130,12 @@ def usage_report(request):
 def api_validate_coupon(request):
     hub = _hub_id(request)
     code = request.POST.get('code', '').strip().upper()
-    subtotal = Decimal(request.POST.get('subtotal', '0'))
+    subtotal = _to_decimal(request.POST.get('subtotal'))
 
     if not code:
         return JsonResponse({'valid': False, 'message': 'Please enter a coupon code'})
 
-    coupon = Coupon.objects.filter(
-        hub_id=hub, code__iexact=code, is_deleted=False,
-    ).first()
+    coupon = _coupon_by_code(hub, code)
 
     if not coupon:
         return JsonResponse({'valid': False, 'message': 'Invalid coupon code'})
@@ -635,8 +1150,8 @@ def api_validate_coupon(request):
         'coupon_id': str(coupon.id),
         'coupon_name': coupon.name,
         'discount_type': coupon.discount_type,
-        'discount_value': str(coupon.discount_value),
-        'discount_amount': str(discount_amount),
+        'discount_value': format(coupon.discount_value, 'f'),
+        'discount_amount': format(discount_amount, 'f'),
     })
 
 
@@ -644,22 +1159,31 @@ def api_validate_coupon(request):
 @require_GET
 def api_active_promotions(request):
     hub = _hub_id(request)
-    promotions = Promotion.objects.filter(
+    key = versioned_key('promotions', hub, 'api_active')
+    data = cache.get(key)
+    if data is not None:
+        return _json_response({'promotions': data})
+
+    promotions = Promotion.with_validity(Promotion.objects.filter(
         hub_id=hub, is_active=True, is_deleted=False,
-    ).order_by('-priority')
+    )).order_by('-priority').values(
+        'id', 'name', 'description', 'discount_type', 'discount_value',
+        'scope', 'stackable', 'computed_is_valid',
+    )
 
     data = [{
-        'id': str(p.id),
-        'name': p.name,
-        'description': p.description,
-        'discount_type': p.discount_type,
-        'discount_value': str(p.discount_value),
-        'scope': p.scope,
-        'stackable': p.stackable,
-        'is_valid': p.is_valid,
+        'id': p['id'],
+        'name': p['name'],
+        'description': p['description'],
+        'discount_type': p['discount_type'],
+        'discount_value': p['discount_value'],
+        'scope': p['scope'],
+        'stackable': p['stackable'],
+        'is_valid': p['computed_is_valid'],
     } for p in promotions]
+    cache.set(key, data, ACTIVE_PROMOTIONS_CACHE_TTL)
 
-    return JsonResponse({'promotions': data})
+    return _json_response({'promotions': data})
 
 
 @login_required
@@ -667,21 +1191,29 @@ def api_active_promotions(request):
 def api_calculate_discounts(request):
     hub = _hub_id(request)
     try:
-        data = json.loads(request.body)
-    except json.JSONDecodeError:
+        data = _json_loads(request.body)
+    except ValueError:  # json.JSONDecodeError and orjson.JSONDecodeError
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
 
-    total = Decimal(str(data.get('total', '0')))
+    total = _to_decimal(data.get('total'))
     coupon_code = data.get('coupon_code')
 
+    inputs = f"{total}|{(coupon_code or '').strip().upper()}"
+    key = multi_versioned_key(
+        ('promotions', 'coupons'), hub, 'api_calculate',
+        int(time.time() // CALCULATE_CACHE_TTL),
+        hashlib.md5(inputs.encode()).hexdigest(),
+    )
+    payload = cache.get(key)
+    if payload is not None:
+        return _json_response(payload)
+
     applied = []
-    total_discount = Decimal('0.00')
+    total_discount = ZERO
 
     # Apply coupon if provided
     if coupon_code:
-        coupon = Coupon.objects.filter(
-            hub_id=hub, code__iexact=coupon_code, is_deleted=False,
-        ).first()
+        coupon = _coupon_by_code(hub, coupon_code)
         if coupon:
             can_use, _ = coupon.can_use(order_total=total)
             if can_use:
@@ -691,17 +1223,19 @@ def api_calculate_discounts(request):
                     'source': 'coupon',
                     'source_id': str(coupon.id),
                     'source_name': coupon.name,
-                    'discount_amount': str(discount),
+                    'discount_amount': format(discount, 'f'),
                 })
 
-    # Apply active promotions
-    promotions = Promotion.objects.filter(
-        hub_id=hub, is_active=True, is_deleted=False,
-    ).order_by('-priority')
+    # Apply active promotions; the schedule is filtered in SQL, minimum purchase here
+    # The shared live-promotions flag lets hubs without promotions skip even
+    # the per-hub list lookup (and its query when that cache is cold).
+    live = _live_promotions(hub) if get_discount_service().has_live_promotions() else ()
+    promotions = [
+        promo for promo in live
+        if promo.min_purchase is None or promo.min_purchase <= total
+    ]
 
     for promo in promotions:
-        if not promo.is_valid:
-            continue
         discount = promo.calculate_discount(total - total_discount if not promo.stackable else total)
         if discount > 0:
             total_discount += discount
@@ -709,17 +1243,20 @@ def api_calculate_discounts(request):
                 'source': 'promotion',
                 'source_id': str(promo.id),
                 'source_name': promo.name,
-                'discount_amount': str(discount),
+                'discount_amount': format(discount, 'f'),
             })
             if not promo.stackable:
                 break
 
-    return JsonResponse({
-        'original_total': str(total),
-        'discounted_total': str(max(Decimal('0'), total - total_discount)),
-        'total_discount': str(total_discount),
+    payload = {
+        'original_total': format(total, 'f'),
+        'discounted_total': format(max(ZERO, total - total_discount), 'f'),
+        'total_discount': format(total_discount, 'f'),
         'applied_discounts': applied,
-    })
+    }
+    cache.set(key, payload, CALCULATE_CACHE_TTL)
+
+    return _json_response(payload)
 
 
 @login_required
@@ -729,23 +1266,31 @@ def api_apply_discount(request):
     discount_id = request.POST.get('discount_id')
     discount_source = request.POST.get('source', 'coupon')
     sale_id = request.POST.get('sale_id')
-    original_amount = Decimal(request.POST.get('original_amount', '0'))
-    discount_amount = Decimal(request.POST.get('discount_amount', '0'))
-
-    kwargs = {'hub_id': hub, 'amount_discounted': discount_amount, 'original_amount': original_amount}
-
-    if sale_id:
-        kwargs['sale_id'] = sale_id
+    original_amount = _to_decimal(request.POST.get('original_amount'))
+    discount_amount = _to_decimal(request.POST.get('discount_amount'))
 
     if discount_source == 'coupon':
-        coupon = get_object_or_404(Coupon, id=discount_id, hub_id=hub, is_deleted=False)
-        kwargs['coupon'] = coupon
-        coupon.increment_usage()
+        # Only the pk and hub are needed: record_usage bumps the counter with an
+        # F() UPDATE and inserts the usage row in the same transaction.
+        coupon = get_object_or_404(
+            Coupon.objects.only('id', 'hub_id'), id=discount_id, hub_id=hub, is_deleted=False,
+        )
+        coupon.record_usage(
+            sale_id=sale_id or None,
+            amount_discounted=discount_amount,
+            original_amount=original_amount,
+        )
     else:
-        promotion = get_object_or_404(Promotion, id=discount_id, hub_id=hub, is_deleted=False)
-        kwargs['promotion'] = promotion
-
-    DiscountUsage.objects.create(**kwargs)
+        promotion = get_object_or_404(
+            Promotion.objects.only('id'), id=discount_id, hub_id=hub, is_deleted=False,
+        )
+        DiscountUsage.objects.create(
+            hub_id=hub,
+            promotion=promotion,
+            sale_id=sale_id or None,
+            amount_discounted=discount_amount,
+            original_amount=original_amount,
+        )
 
     return JsonResponse({'success': True})
 
@@ -759,20 +1304,29 @@ def api_apply_discount(request):
 @htmx_view('discounts/pages/settings.html', 'discounts/partials/settings_content.html')
 def settings_view(request):
     hub = _hub_id(request)
-    total_coupons = Coupon.objects.filter(hub_id=hub, is_deleted=False).count()
-    active_coupons = sum(
-        1 for c in Coupon.objects.filter(hub_id=hub, is_deleted=False)
-        if c.status == 'active'
-    )
-    total_promotions = Promotion.objects.filter(hub_id=hub, is_deleted=False).count()
-    active_promotions = sum(
-        1 for p in Promotion.objects.filter(hub_id=hub, is_deleted=False)
-        if p.status == 'active'
-    )
+    now = timezone.now()
+    # One conditional aggregate per table yields both the total and active
+    # counts; each is cached under its namespace version, so writes refresh
+    # it and the TTL bounds drift from schedules starting or ending.
+    counts = {'total': Count('id'), 'active': Count('id', filter=Q(computed_status='active'))}
+    coupon_key = versioned_key('coupons', hub, 'settings_counts')
+    coupon_counts = cache.get(coupon_key)
+    if coupon_counts is None:
+        coupon_counts = Coupon.with_status(
+            Coupon.objects.filter(hub_id=hub, is_deleted=False), now,
+        ).aggregate(**counts)
+        cache.set(coupon_key, coupon_counts, COUNT_CACHE_TTL)
+    promotion_key = versioned_key('promotions', hub, 'settings_counts')
+    promotion_counts = cache.get(promotion_key)
+    if promotion_counts is None:
+        promotion_counts = Promotion.with_status(
+            Promotion.objects.filter(hub_id=hub, is_deleted=False), now,
+        ).aggregate(**counts)
+        cache.set(promotion_key, promotion_counts, COUNT_CACHE_TTL)
 
     return {
-        'total_coupons': total_coupons,
-        'active_coupons': active_coupons,
-        'total_promotions': total_promotions,
-        'active_promotions': active_promotions,
+        'total_coupons': coupon_counts['total'],
+        'active_coupons': coupon_counts['active'],
+        'total_promotions': promotion_counts['total'],
+        'active_promotions': promotion_counts['active'],
     }